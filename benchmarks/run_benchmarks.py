@@ -0,0 +1,189 @@
+"""
+This module times, and measures the peak memory of, each stage of building and
+exporting a tree for synthetic CLIs of increasing size. Results are written as JSON
+and can be compared against a previous run to catch performance regressions.
+
+Usage:
+    PYTHONPATH=src python -m benchmarks.run_benchmarks --output results.json
+    PYTHONPATH=src python -m benchmarks.run_benchmarks --baseline results.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+import click
+
+from click_tree_viz import ClickTreeViz, __version__
+from click_tree_viz.click_utils import recurse_click_cli
+from click_tree_viz.flat_tree import FlatTree
+from click_tree_viz.rich_utils import build_rich_tree
+
+from benchmarks.synthetic import count_nodes, make_cli
+
+# name: (breadth, depth, params per command)
+SCENARIOS = {
+    "small": (3, 3, 3),
+    "medium": (10, 3, 3),
+    "large": (10, 4, 3),
+    "huge": (10, 5, 2),
+}
+
+DEFAULT_SCENARIOS = ["small", "medium", "large"]
+
+
+def _stages(cli: click.Group) -> List[Tuple[str, Callable[[], Callable[[], Any]]]]:
+    """
+    This method lists each stage as a name and a setup callable. The setup, which is
+    not measured, returns the callable performing the stage itself.
+    """
+    nodes = recurse_click_cli(cli)
+    tree = FlatTree(nodes)
+    viz = ClickTreeViz(cli)
+
+    def _exporter(method_name: str, **kwargs) -> Callable[[], Callable[[], Any]]:
+        def _setup():
+            # Exporters are memoized, so every run needs to start from scratch
+            viz.clear_export_cache()
+            return lambda: getattr(viz, method_name)(**kwargs)
+
+        return _setup
+
+    return [
+        ("recurse_click_cli", lambda: lambda: recurse_click_cli(cli)),
+        ("FlatTree", lambda: lambda: FlatTree(nodes)),
+        ("to_treelib", lambda: lambda: tree.to_treelib(params=True)),
+        ("ClickTreeViz", lambda: lambda: ClickTreeViz(cli)),
+        ("to_dict", _exporter("to_dict")),
+        ("to_json", _exporter("to_json")),
+        ("to_graphviz", _exporter("to_graphviz")),
+        ("print", _exporter("print", stdout=False)),
+        ("build_rich_tree", lambda: lambda: build_rich_tree(tree, return_obj=True)),
+        ("render_many", _exporter("render_many", exporters=["json", "dot", "text", "ndjson"])),
+    ]
+
+
+def _measure(setup: Callable[[], Callable[[], Any]], repeat: int) -> Dict[str, float]:
+    """Times the best of `repeat` runs, then measures peak memory in a separate run"""
+    timings = []
+    for _ in range(repeat):
+        stage = setup()
+        start = time.perf_counter()
+        stage()
+        timings.append(time.perf_counter() - start)
+
+    # Tracing slows allocations down, so memory is measured apart from timing
+    stage = setup()
+    tracemalloc.start()
+    try:
+        stage()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": min(timings), "peak_bytes": peak_bytes}
+
+
+def run(scenarios: List[str], repeat: int, stages: List[str] = None) -> Dict[str, Any]:
+    """
+    This method benchmarks every stage for each of the named scenarios
+    Args:
+        scenarios: The names of the scenarios, see SCENARIOS
+        repeat: The number of timed runs per stage, the fastest is kept
+        stages: If provided, only the stages with these names are run
+
+    Returns:
+        The machine readable results
+    """
+    results = {}
+    for scenario in scenarios:
+        breadth, depth, params_per_command = SCENARIOS[scenario]
+        cli = make_cli(breadth, depth, params_per_command)
+        results[scenario] = {
+            "breadth": breadth,
+            "depth": depth,
+            "params_per_command": params_per_command,
+            "nodes": count_nodes(breadth, depth),
+            "stages": {},
+        }
+        for name, setup in _stages(cli):
+            if stages is None or name in stages:
+                results[scenario]["stages"][name] = _measure(setup, repeat)
+                _report(scenario, name, results[scenario]["stages"][name])
+
+    return {
+        "meta": {
+            "click_tree_viz": __version__,
+            "click": click.__version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def _report(scenario: str, stage: str, measurement: Dict[str, float]):
+    print(
+        f"{scenario:>8} {stage:<22} {measurement['seconds'] * 1000:>10.2f} ms "
+        f"{measurement['peak_bytes'] / 1024:>12.1f} KiB",
+        file=sys.stderr,
+    )
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    This method lists the stages which got slower, or used more memory, than the
+    baseline by more than the tolerance (e.g. 0.2 for 20%)
+    """
+    regressions = []
+    for scenario, result in current["results"].items():
+        baseline_stages = baseline["results"].get(scenario, {}).get("stages", {})
+        for stage, measurement in result["stages"].items():
+            for metric, value in measurement.items():
+                baseline_value = baseline_stages.get(stage, {}).get(metric)
+                if baseline_value and value > baseline_value * (1 + tolerance):
+                    regressions.append(
+                        f"{scenario}/{stage} {metric}: {baseline_value:.6g} -> {value:.6g} "
+                        f"({value / baseline_value - 1:+.0%})"
+                    )
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    """Runs the benchmarks from the command line, returning the exit code"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=sorted(SCENARIOS),
+        help=f"Scenarios to run, defaults to {', '.join(DEFAULT_SCENARIOS)}",
+    )
+    parser.add_argument("--stage", action="append", help="Only run the named stages")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage")
+    parser.add_argument("--output", help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Previous JSON results to compare against")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="Allowed regression, 0.2 being 20%%"
+    )
+    args = parser.parse_args(argv)
+
+    results = run(args.scenario or DEFAULT_SCENARIOS, repeat=args.repeat, stages=args.stage)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(results, output_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as baseline_file:
+            regressions = compare(results, json.load(baseline_file), tolerance=args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+This module generates synthetic Click CLIs of a configurable shape for benchmarking
+"""
+
+import click
+
+# Options shared by many commands, as is typical of real CLIs
+COMMON_PARAMS = [
+    lambda: click.Option(["--verbose", "-v"], is_flag=True, help="Enables verbose output."),
+    lambda: click.Option(["--config"], help="The configuration file to use."),
+    lambda: click.Option(["--dry-run"], is_flag=True, help="Only pretend to run."),
+]
+
+
+def _make_params(params_per_command: int, seed: str):
+    """Mixes shared options with ones unique to the command"""
+    params = []
+    for index in range(params_per_command):
+        if index < len(COMMON_PARAMS):
+            params.append(COMMON_PARAMS[index]())
+        elif index % 2:
+            params.append(click.Argument([f"{seed}_arg{index}"]))
+        else:
+            params.append(click.Option([f"--{seed}-opt{index}"], help=f"Option {index}."))
+    return params
+
+
+def make_cli(breadth: int, depth: int, params_per_command: int) -> click.Group:
+    """
+    This method builds a Click group with `breadth` sub commands per group, `depth`
+    levels of nesting (the last one being commands) and `params_per_command`
+    parameters on every command and group
+    Args:
+        breadth: The number of sub commands of every group
+        depth: The number of levels below the root group
+        params_per_command: The number of parameters of every command and group
+
+    Returns:
+        The root Click group
+    """
+    root = click.Group("cli", help="Synthetic CLI.")
+    # Each entry holds a group and the level of its children
+    stack = [(root, 1)]
+    while stack:
+        group, level = stack.pop()
+        for index in range(breadth):
+            name = f"{'group' if level < depth else 'command'}{index}"
+            seed = f"l{level}c{index}"
+            if level < depth:
+                sub_command = click.Group(
+                    name, help=f"Group {name}.", params=_make_params(params_per_command, seed)
+                )
+                stack.append((sub_command, level + 1))
+            else:
+                sub_command = click.Command(
+                    name, help=f"Command {name}.", params=_make_params(params_per_command, seed)
+                )
+            group.add_command(sub_command)
+    return root
+
+
+def count_nodes(breadth: int, depth: int) -> int:
+    """The number of commands and groups below the root of a synthetic CLI"""
+    return sum(breadth**level for level in range(1, depth + 1))
@@ -4,3 +4,5 @@ Initialise import scope
 __version__ = "0.1"
 
 from click_tree_viz.cli_tree import ClickTreeViz
+from click_tree_viz.exporters import Exporter, register_exporter
+from click_tree_viz.snapshot import CliSnapshot
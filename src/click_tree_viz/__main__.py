@@ -0,0 +1,148 @@
+"""
+This module provides the click-tree-viz console script, which renders a Click CLI
+given its import path in several formats from a single traversal, e.g.
+
+    click-tree-viz battleship:cli --format json,dot --out docs/cli
+"""
+
+import os
+import sys
+from contextlib import ExitStack
+from typing import Any, List, Optional, TextIO, Tuple
+
+import click
+
+from click_tree_viz.cache import TreeCache
+from click_tree_viz.cli_tree import ClickTreeViz
+from click_tree_viz.exporters import Exporter, create_exporter
+
+# The file extension written for each format
+FORMATS = {
+    "json": ".json",
+    "ndjson": ".ndjson",
+    "dot": ".dot",
+    "text": ".txt",
+    "rich": ".rich.txt",
+}
+
+
+def _parse_formats(
+    ctx: click.Context, param: click.Parameter, value: str  # pylint:disable=unused-argument
+) -> List[str]:
+    """Splits the comma separated formats, rejecting unknown ones"""
+    formats = [x.strip() for x in value.split(",") if x.strip()]
+    unknown = [x for x in formats if x not in FORMATS]
+    if unknown or not formats:
+        raise click.BadParameter(
+            f"expected a comma separated list of {', '.join(FORMATS)}, got {value!r}"
+        )
+    # Each format is written once, in the order requested
+    return list(dict.fromkeys(formats))
+
+
+def _exporter(output_format: str, file_obj: Optional[TextIO]) -> Exporter:
+    """Creates the exporter of one of the FORMATS, streaming to the file if it can"""
+    if file_obj is not None and output_format in ("json", "ndjson", "dot"):
+        return create_exporter(output_format, file_obj=file_obj)
+    return create_exporter(output_format)
+
+
+def _write(output_format: str, result: Any, file_obj: TextIO):
+    """Writes the output of an exporter which was not streamed to the file-like object"""
+    if output_format == "rich":
+        from rich.console import Console  # pylint:disable=import-outside-toplevel
+
+        Console(file=file_obj).print(result)
+    elif result is not None:
+        file_obj.write(result)
+    if output_format == "json":
+        file_obj.write("\n")
+
+
+def _render(tree: ClickTreeViz, formats: List[str], files: List[TextIO], stream: bool):
+    """Renders every format in a single traversal, writing each to its file"""
+    exporters = [_exporter(x, y if stream else None) for x, y in zip(formats, files)]
+    results = tree.render_many(exporters)
+    for output_format, result, file_obj in zip(formats, results, files):
+        _write(output_format, result, file_obj)
+
+
+@click.command(name="click-tree-viz")
+@click.argument("import_path")
+@click.option(
+    "--format",
+    "formats",
+    default="text",
+    show_default=True,
+    callback=_parse_formats,
+    help=f"Comma separated output formats, from {', '.join(FORMATS)}.",
+)
+@click.option(
+    "--out",
+    type=click.Path(file_okay=False, writable=True),
+    help="Directory to write a file per format to, rather than printing them.",
+)
+@click.option("--max-depth", type=int, help="Don't expand commands nested deeper than this.")
+@click.option(
+    "--cache/--no-cache",
+    default=False,
+    show_default=True,
+    help="Reuse the tree extracted by an earlier run while the CLI's source is unchanged.",
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False),
+    help="Where the cache is kept, implies --cache. Defaults to the user cache directory.",
+)
+@click.option(
+    "--cache-path",
+    "cache_paths",
+    multiple=True,
+    type=click.Path(exists=True),
+    help="A further file or directory the CLI is built from (e.g. plugins), implies --cache. "
+    "The cached tree is rebuilt whenever it changes. Can be repeated.",
+)
+def main(  # pylint:disable=too-many-arguments
+    import_path: str,
+    formats: List[str],
+    out: Optional[str],
+    max_depth: Optional[int],
+    cache: bool,
+    cache_dir: Optional[str],
+    cache_paths: Tuple[str, ...],
+):
+    """
+    Renders the Click CLI at IMPORT_PATH, e.g. 'package.module:cli'. The CLI is
+    imported and traversed once, however many formats are requested.
+    """
+    # Like `python -m`, allow CLIs in the working directory to be imported
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+
+    try:
+        tree = ClickTreeViz.from_import_path(
+            import_path,
+            max_depth=max_depth,
+            cache=TreeCache(directory=cache_dir) if cache or cache_dir or cache_paths else None,
+            extra_paths=[os.path.abspath(x) for x in cache_paths],
+        )
+    except (ValueError, ImportError, AttributeError) as exc:
+        raise click.ClickException(f"Could not import {import_path!r}: {exc}") from exc
+
+    if out is None:
+        # Formats are printed one after another, so none of them is streamed
+        _render(tree, formats, [sys.stdout] * len(formats), stream=False)
+        return
+
+    os.makedirs(out, exist_ok=True)
+    stem = import_path.rpartition(":")[2]
+    paths = [os.path.join(out, stem + FORMATS[x]) for x in formats]
+    with ExitStack() as stack:
+        files = [stack.enter_context(open(x, "w", encoding="utf-8")) for x in paths]
+        _render(tree, formats, files, stream=True)
+    for path in paths:
+        click.echo(f"Wrote {path}", err=True)
+
+
+if __name__ == "__main__":
+    main(prog_name="click-tree-viz")  # pylint:disable=no-value-for-parameter,unexpected-keyword-arg
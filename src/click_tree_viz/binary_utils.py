@@ -0,0 +1,356 @@
+"""
+This module provides a compact binary file format for the nodes of a Click CLI. A
+file is read in place, e.g. through mmap, so that single commands can be looked up
+without parsing the whole file or importing the CLI.
+
+Every integer is little endian. The file consists of, in order:
+
+    header         magic, version and the count of each table (see _HEADER)
+    string index   (strings + 1) uint32 offsets of each string in the string data
+    nodes          a _NODE record per command, in depth first order
+    path index     a uint32 node position per command, sorted by path
+    param refs     the uint32 param position of each parameter of each node
+    params         a _PARAM record per distinct parameter
+    opt refs       the uint32 string position of each option string of each param
+    string data    the UTF-8 encoded strings, back to back
+"""
+
+import mmap
+import struct
+from collections.abc import Sequence
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from click_tree_viz.click_utils import ROOT_ID, ClickNode, ParamSpec
+
+MAGIC = b"CTVB"
+
+# Bump whenever the layout of the file changes
+BINARY_FORMAT_VERSION = 1
+
+# Marks a missing string, e.g. a command without help
+_NONE = 0xFFFFFFFF
+
+# magic, version, strings, nodes, param refs, params, opt refs
+_HEADER = struct.Struct("<4sIIIIII")
+# name, route segment, help, parent position, first param ref, param count, is_group
+_NODE = struct.Struct("<IIIiIIB3x")
+# type, name, help, first opt ref, opt count, has_help
+_PARAM = struct.Struct("<IIIIIB3x")
+_UINT = struct.Struct("<I")
+
+
+class _StringTable:  # pylint:disable=too-few-public-methods
+    """Numbers each distinct string in the order it is first added"""
+
+    def __init__(self):
+        self.positions: Dict[str, int] = {}
+        self.offsets = [0]
+        self.data = bytearray()
+
+    def add(self, value: Optional[str]) -> int:
+        """Returns the position of the string, adding it if it is new"""
+        if value is None:
+            return _NONE
+        position = self.positions.get(value)
+        if position is None:
+            position = self.positions[value] = len(self.offsets) - 1
+            self.data += value.encode("utf-8")
+            self.offsets.append(len(self.data))
+        return position
+
+
+class _ParamTable:  # pylint:disable=too-few-public-methods
+    """Numbers each distinct parameter in the order it is first added"""
+
+    def __init__(self, strings: _StringTable):
+        self.strings = strings
+        self.positions: Dict[ParamSpec, int] = {}
+        self.records = bytearray()
+        self.opt_refs: List[int] = []
+
+    def add(self, param: ParamSpec) -> int:
+        """Returns the position of the parameter, adding it if it is new"""
+        position = self.positions.get(param)
+        if position is None:
+            position = self.positions[param] = len(self.positions)
+            self.records += _PARAM.pack(
+                self.strings.add(param["type"]),
+                self.strings.add(param["name"]),
+                self.strings.add(param.get("help")),
+                len(self.opt_refs),
+                len(param["opts"]),
+                "help" in param,
+            )
+            self.opt_refs.extend(self.strings.add(x) for x in param["opts"])
+        return position
+
+
+class _Memo(dict):
+    """Memoizes a function of one argument"""
+
+    def __init__(self, func: Callable[[int], Any]):
+        super().__init__()
+        self.func = func
+
+    def __missing__(self, key: int) -> Any:
+        value = self[key] = self.func(key)
+        return value
+
+    def __call__(self, key: int) -> Any:
+        return self[key]
+
+
+def _pack_uints(values: Iterable[int]) -> bytes:
+    values = list(values)
+    return struct.pack(f"<{len(values)}I", *values)
+
+
+def write_binary(node_sequence: Iterable[ClickNode], file_obj: BinaryIO):
+    """
+    This method writes the nodes of the CLI in the binary format. Distinct strings
+    and parameters are stored once, however many commands share them.
+    Args:
+        node_sequence: The nodes of the CLI in depth first order
+        file_obj: The binary file-like object to write to
+
+    Raises:
+        ValueError: If a node is not directly below one which precedes it
+    """
+    strings = _StringTable()
+    params = _ParamTable(strings)
+    param_refs: List[int] = []
+    nodes, paths = bytearray(), []
+
+    # The position of the latest node at each depth, i.e. the open ancestors
+    ancestors: List[int] = []
+    for position, node in enumerate(node_sequence):
+        depth = len(node.route) - 1
+        if depth > len(ancestors):
+            raise ValueError(f"The parent of '{node.path}' does not precede it")
+        del ancestors[depth:]
+        parent = ancestors[-1] if ancestors else -1
+        ancestors.append(position)
+        paths.append(node.path)
+
+        nodes += _NODE.pack(
+            strings.add(node.name),
+            strings.add(node.route[-1]),
+            strings.add(node.help),
+            parent,
+            len(param_refs),
+            len(node.params),
+            node.is_group,
+        )
+        param_refs.extend(params.add(x) for x in node.params)
+
+    node_count = len(paths)
+    path_index = sorted(range(node_count), key=paths.__getitem__)
+    file_obj.write(
+        _HEADER.pack(
+            MAGIC,
+            BINARY_FORMAT_VERSION,
+            len(strings.offsets) - 1,
+            node_count,
+            len(param_refs),
+            len(params.positions),
+            len(params.opt_refs),
+        )
+    )
+    for section in (
+        _pack_uints(strings.offsets),
+        nodes,
+        _pack_uints(path_index),
+        _pack_uints(param_refs),
+        params.records,
+        _pack_uints(params.opt_refs),
+        strings.data,
+    ):
+        file_obj.write(section)
+
+
+class BinaryTree(Sequence):  # pylint:disable=too-many-instance-attributes
+    """
+    This class reads a file in the binary format in place. It is a sequence of the
+    ClickNode objects of the CLI in depth first order, each one decoded only when it
+    is accessed, so opening even a very large tree costs the same as a small one.
+    """
+
+    def __init__(self, buffer):
+        """
+        Args:
+            buffer: The contents of the file, any object supporting the buffer
+                protocol, e.g. bytes or an mmap
+
+        Raises:
+            ValueError: If the buffer does not hold a tree in this version of the format
+        """
+        if len(buffer) < _HEADER.size:
+            raise ValueError("Not a click-tree-viz binary tree")
+        magic, version, string_count, node_count, ref_count, param_count, opt_count = (
+            _HEADER.unpack_from(buffer)
+        )
+        if magic != MAGIC or version != BINARY_FORMAT_VERSION:
+            raise ValueError(f"Not a version {BINARY_FORMAT_VERSION} click-tree-viz binary tree")
+
+        self._buffer = buffer
+        self._node_count = node_count
+        self._string_index = _HEADER.size
+        self._nodes = self._string_index + (string_count + 1) * _UINT.size
+        self._path_index = self._nodes + node_count * _NODE.size
+        self._param_refs = self._path_index + node_count * _UINT.size
+        self._params = self._param_refs + ref_count * _UINT.size
+        self._opt_refs = self._params + param_count * _PARAM.size
+        self._string_data = self._opt_refs + opt_count * _UINT.size
+
+        # The last offset of the string index is the length of the string data
+        end = self._string_data
+        if len(buffer) >= end:
+            end += _UINT.unpack_from(buffer, self._nodes - _UINT.size)[0]
+        if len(buffer) < end:
+            raise ValueError(f"Truncated click-tree-viz binary tree, expected {end} bytes")
+
+    @classmethod
+    def open(cls, path: str) -> "BinaryTree":
+        """
+        This method maps a file into memory read-only, so that only the pages which
+        are accessed are ever read from disk. Close the tree once it is no longer used,
+        e.g. by opening it in a with statement.
+        Args:
+            path: The location of the file
+
+        Returns:
+            The tree held by the file
+
+        Raises:
+            ValueError: If the file does not hold a tree in this version of the format
+        """
+        with open(path, "rb") as file_obj:
+            buffer = mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return cls(buffer)
+        except ValueError:
+            buffer.close()
+            raise
+
+    def close(self):
+        """Releases the memory mapping, if the tree was opened from a file"""
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+    def __enter__(self) -> "BinaryTree":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._node_count
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[x] for x in range(*position.indices(self._node_count))]
+        if position < 0:
+            position += self._node_count
+        if not 0 <= position < self._node_count:
+            raise IndexError(position)
+
+        return self._decode(self._node(position), self._route(position), self._string, self._param)
+
+    def __iter__(self) -> Iterator[ClickNode]:
+        # Strings, parameters and the routes of groups are shared between nodes, so
+        # each is decoded once when the whole tree is read
+        strings = _Memo(self._string)
+        params = _Memo(self._param)
+        routes: List[Tuple[str, ...]] = []
+        for position in range(self._node_count):
+            record = self._node(position)
+            parent_route = routes[record[3]] if record[3] >= 0 else ()
+            routes.append(parent_route + (strings(record[1]),))
+            yield self._decode(record, routes[-1], strings, params)
+
+    def _decode(
+        self,
+        record: tuple,
+        route: Sequence[str],
+        string: Callable[[int], Optional[str]],
+        param: Callable[[int], ParamSpec],
+    ) -> ClickNode:
+        """Builds the ClickNode of a node record"""
+        name, _, help_text, _, first_ref, param_count, is_group = record
+        return ClickNode(
+            name=string(name),
+            route=route,
+            params=[
+                param(self._uint(self._param_refs, x))
+                for x in range(first_ref, first_ref + param_count)
+            ],
+            is_group=bool(is_group),
+            help=string(help_text),
+        )
+
+    def _uint(self, table: int, position: int) -> int:
+        return _UINT.unpack_from(self._buffer, table + position * _UINT.size)[0]
+
+    def _node(self, position: int) -> tuple:
+        return _NODE.unpack_from(self._buffer, self._nodes + position * _NODE.size)
+
+    def _string(self, position: int) -> Optional[str]:
+        if position == _NONE:
+            return None
+        start, end = struct.unpack_from("<II", self._buffer, self._string_index + position * 4)
+        return str(self._buffer[self._string_data + start : self._string_data + end], "utf-8")
+
+    def _route(self, position: int) -> List[str]:
+        """The route to a node, following the parent of each node up to the root"""
+        route = []
+        while position >= 0:
+            _, segment, _, position, _, _, _ = self._node(position)
+            route.append(self._string(segment))
+        return route[::-1]
+
+    def _param(self, position: int) -> ParamSpec:
+        param_type, name, help_text, first_opt, opt_count, has_help = _PARAM.unpack_from(
+            self._buffer, self._params + position * _PARAM.size
+        )
+        opt_refs = range(first_opt, first_opt + opt_count)
+        return ParamSpec.intern(
+            param_type=self._string(param_type),
+            name=self._string(name),
+            opts=[self._string(self._uint(self._opt_refs, x)) for x in opt_refs],
+            help_text=self._string(help_text),
+            has_help=bool(has_help),
+        )
+
+    def find(self, path: str) -> Optional[int]:
+        """
+        This method binary searches the path index, decoding O(log n) routes rather
+        than scanning the tree
+        Args:
+            path: The dot separated route to a command, e.g. 'ship.move'
+
+        Returns:
+            The position of the node, or None if there is no such node
+        """
+        low, high = 0, self._node_count
+        while low < high:
+            middle = (low + high) // 2
+            position = self._uint(self._path_index, middle)
+            middle_path = ".".join(self._route(position))
+            if middle_path == path:
+                return position
+            if middle_path < path:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def get(self, path: str) -> Optional[ClickNode]:
+        """
+        Args:
+            path: The dot separated route to a command, e.g. 'ship.move'
+
+        Returns:
+            The node of the command, or None if there is no such command
+        """
+        position = None if path == ROOT_ID else self.find(path)
+        return None if position is None else self[position]
@@ -0,0 +1,239 @@
+"""
+This module provides a persistent on-disk cache of extracted CLI trees, keyed by a
+fingerprint of the source files of the CLI so that a stale tree is never served
+"""
+
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import sysconfig
+import tempfile
+from typing import List, Optional, Sequence, Tuple
+
+import click
+
+from click_tree_viz.click_utils import ClickNode
+
+# Bump whenever the way nodes are extracted or stored changes
+CACHE_FORMAT_VERSION = "2"
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+CACHE_SUFFIX = ".json"
+
+# The path, size and modification time of a source file an entry depends on
+SourceStat = Tuple[str, int, int]
+
+
+def _default_directory() -> str:
+    """The per-user cache directory, honouring XDG_CACHE_HOME where set"""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "click-tree-viz")
+
+
+def _iter_source_files(path: str):
+    """Yields every python source file at (or below) the given path in a stable order"""
+    if os.path.isfile(path):
+        yield path
+        return
+
+    for dir_path, dir_names, file_names in os.walk(path):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            if file_name.endswith(".py"):
+                yield os.path.join(dir_path, file_name)
+
+
+def _package_locations(import_path: str) -> List[str]:
+    """
+    This method locates the source of the top level package containing the CLI
+    without importing it, so that a cache hit never pays for the import
+    """
+    top_level = import_path.partition(":")[0].split(".")[0]
+    spec = importlib.util.find_spec(top_level)
+    if spec is None:
+        raise ImportError(f"Unable to locate the source of {top_level!r}")
+
+    if spec.submodule_search_locations:
+        return sorted(spec.submodule_search_locations)
+    return [spec.origin]
+
+
+def _stat(file_path: str) -> Optional[SourceStat]:
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return file_path, stat.st_size, stat.st_mtime_ns
+
+
+def loaded_source_files() -> List[SourceStat]:
+    """
+    This method lists the source files of every module imported so far, outside of
+    the standard library. Stored with an entry, they catch changes the fingerprint
+    cannot see, such as plugins living in other packages or the sibling modules of a
+    single file CLI.
+
+    Returns:
+        The path, size and modification time of each file
+    """
+    stdlib = tuple(
+        os.path.join(os.path.realpath(sysconfig.get_path(x)), "") for x in ("stdlib", "platstdlib")
+    )
+    files = set()
+    for module in list(sys.modules.values()):
+        file_path = getattr(module, "__file__", None)
+        if file_path and file_path.endswith(".py"):
+            file_path = os.path.realpath(file_path)
+            if not file_path.startswith(stdlib):
+                files.add(file_path)
+    return [x for x in map(_stat, sorted(files)) if x is not None]
+
+
+class TreeCache:
+    """
+    This class stores the flat list of ClickNode objects extracted from a CLI as a
+    JSON file per fingerprint. The total size of the cache directory is bounded,
+    least recently used entries are evicted first.
+
+    The fingerprint covers the CLI's top level package and any extra paths. Entries
+    may also record the other source files the CLI was loaded from (see
+    loaded_source_files), and are only served while none of those has changed.
+    Several processes may share the directory.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            directory: Where to store cached trees, defaults to the user cache directory
+            max_bytes: The maximum total size of the cached trees
+        """
+        self.directory = directory or _default_directory()
+        self.max_bytes = max_bytes
+
+    def fingerprint(
+        self,
+        import_path: str,
+        max_depth: Optional[int] = None,
+        extra_paths: Sequence[str] = (),
+    ) -> str:
+        """
+        This method computes the cache key of a CLI. It covers the content of every
+        source file in the CLI's top level package and the extra paths, the Click and
+        Python versions, the cache format and the traversal arguments. Modules found
+        elsewhere are only covered through the dependencies of an entry, see put.
+        Args:
+            import_path: The location of the Click object, e.g. 'package.module:cli'
+            max_depth: The depth limit the tree is extracted with
+            extra_paths: Any further files or directories the CLI is built from,
+                such as plugins living outside of its package
+
+        Returns:
+            A hex digest identifying this exact version of the CLI
+        """
+        digest = hashlib.sha256()
+        header = [CACHE_FORMAT_VERSION, click.__version__, sys.version, import_path]
+        digest.update("\0".join(header + [repr(max_depth)]).encode())
+
+        for location in _package_locations(import_path) + list(extra_paths):
+            for file_path in _iter_source_files(location):
+                digest.update(b"\0" + file_path.encode() + b"\0")
+                with open(file_path, "rb") as source_file:
+                    digest.update(source_file.read())
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def get(self, key: str) -> Optional[List[ClickNode]]:
+        """
+        Args:
+            key: The fingerprint of the CLI
+
+        Returns:
+            The cached nodes, or None if the CLI has not been cached
+        """
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, "r", encoding="utf-8") as entry_file:
+                entry = json.load(entry_file)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            # Treat a corrupt entry as a miss so it is rebuilt
+            _remove(entry_path)
+            return None
+
+        # A source file outside of the fingerprint changed since the entry was stored
+        if any(_stat(x[0]) != tuple(x) for x in entry["dependencies"]):
+            return None
+
+        # Mark as recently used, unless another process evicted it meanwhile
+        try:
+            os.utime(entry_path)
+        except FileNotFoundError:
+            pass
+        return [ClickNode(**record) for record in entry["nodes"]]
+
+    def put(self, key: str, nodes: List[ClickNode], dependencies: Sequence[SourceStat] = ()):
+        """
+        This method atomically writes an entry and evicts the least recently used
+        entries until the cache fits within its size bound
+        Args:
+            key: The fingerprint of the CLI
+            nodes: The nodes extracted from the CLI
+            dependencies: The source files the entry is only valid for while they are
+                unchanged, e.g. loaded_source_files()
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as temp_file:
+                entry = {
+                    "nodes": [node.as_dict() for node in nodes],
+                    "dependencies": [list(x) for x in dependencies],
+                }
+                json.dump(entry, temp_file)
+            os.replace(temp_path, self._entry_path(key))
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+        self._evict(keep=key)
+
+    def _evict(self, keep: str):
+        """Removes the least recently used entries while the cache exceeds max_bytes"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(CACHE_SUFFIX):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # Another process removed it meanwhile
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            if entry_path != self._entry_path(keep):
+                _remove(entry_path)
+                total_bytes -= size
+
+    def clear(self):
+        """Removes every cached tree"""
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(CACHE_SUFFIX):
+                    _remove(entry.path)
+
+
+def _remove(file_path: str):
+    """Removes a file, unless another process sharing the cache already has"""
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
@@ -4,142 +4,935 @@
 This module provides a class to visualise Click CLI structures
 """
 
+import functools
+import inspect
 import io
-from contextlib import redirect_stdout
-from copy import deepcopy
-from typing import Union, Dict, Any, List
-
-import treelib
+import itertools
+import threading
+from collections import OrderedDict
+from contextlib import ExitStack
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    BinaryIO,
+    Union,
+    Dict,
+    Any,
+    List,
+    Optional,
+    Callable,
+    Hashable,
+    Iterator,
+    Sequence,
+    TextIO,
+)
 
 from click import Group, MultiCommand
 
-from click_tree_viz.click_utils import ClickNode, recurse_click_cli
-from click_tree_viz.rich_utils import build_rich_tree
+from click_tree_viz.binary_utils import BinaryTree, write_binary
+from click_tree_viz.click_utils import (
+    ROOT_ID,
+    ClickNode,
+    discover_click_cli,
+    import_click_object,
+    iter_click_subtree,
+    recurse_click_cli,
+)
+from click_tree_viz.dot_utils import write_dot
+from click_tree_viz.exporters import Exporter, create_exporter, visit
+from click_tree_viz.flat_tree import FlatTree, as_flat_tree
+from click_tree_viz.instrumentation import NULL_STAGE, Instrumentation
+from click_tree_viz.json_utils import (
+    build_dict,
+    iter_json_chunks,
+    iter_ndjson_lines,
+    write_json,
+    write_ndjson,
+)
+from click_tree_viz.query import CliIndex
+from click_tree_viz.snapshot import CliSnapshot
+from click_tree_viz.text_utils import iter_text_lines, render_text
+
+# rich, treelib, asyncio and the cache and diff modules are only imported by the methods
+# needing them, so that the other exporters don't pay for their import time
+if TYPE_CHECKING:  # pragma: no cover
+    from concurrent.futures import Executor
+
+    import treelib
+
+    from click_tree_viz.cache import TreeCache
+    from click_tree_viz.diff_utils import DiffRecord, NodeDigests
+
+# Marks an exporter output which has not been memoized yet
+_MISSING = object()
+
+
+def _freeze(value: Any) -> Hashable:
+    """Converts exporter arguments to a hashable, order independent equivalent"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, set):
+        return frozenset(_freeze(item) for item in value)
+    return value
+
+
+class _ExportCache:
+    """A bounded, least recently used store of exporter outputs"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        """Retrieves an output, or _MISSING if it has not been produced"""
+        with self._lock:
+            result = self._entries.get(key, _MISSING)
+            if result is not _MISSING:
+                self._entries.move_to_end(key)
+            return result
+
+    def put(self, key: Hashable, result: Any):
+        """Stores an output, evicting the least recently used one if full"""
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Removes every output"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
 
 
-class ClickTreeViz:
+def _memoize_export(method: Callable) -> Callable:
+    """
+    This decorator memoizes the output of a ClickTreeViz exporter. Arguments are
+    normalised against the method signature, so that e.g. to_graphviz() and
+    to_graphviz(shape="plain") share an entry while other arguments do not. The
+    outputs are shared by every caller, so only immutable ones (strings) are memoized.
+    """
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    def _wrapper(self, *args, **kwargs):
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        key = (method.__name__, _freeze(list(bound.arguments.items())[1:]))
+        try:
+            hash(key)
+        except TypeError:
+            # Arguments which cannot be compared are never memoized
+            return method(self, *args, **kwargs)
+
+        # pylint:disable=protected-access
+        export_cache = self._export_cache
+        result = export_cache.get(key)
+        if result is _MISSING:
+            # Only computed outputs are measured, not memoized ones
+            stage_name = method.__name__.lstrip("_")
+            with self._stage(stage_name, nodes=len(self._tree)):
+                result = method(self, *args, **kwargs)
+            export_cache.put(key, result)
+        return result
+
+    return _wrapper
+
+
+async def _run_in_executor(executor: Optional["Executor"], func: Callable, *args, **kwargs) -> Any:
+    """Runs a blocking callable in an executor, without blocking the event loop"""
+    import asyncio  # pylint:disable=import-outside-toplevel
+
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+def _iter_text_chunks(node_sequence: Sequence[ClickNode], **kwargs) -> Iterator[str]:
+    return (line + "\n" for line in iter_text_lines(node_sequence, **kwargs))
+
+
+# The formats which ClickTreeViz.astream produces piece by piece
+_STREAMS: Dict[str, Callable[..., Iterator[str]]] = {
+    "json": iter_json_chunks,
+    "ndjson": iter_ndjson_lines,
+    "text": _iter_text_chunks,
+}
+
+
+def _serialise_node_data(tree_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    This method replaces the ClickNode objects held as data in a nested dictionary
+    produced by treelib with their JSON serialisable dictionary form (in place)
+    Args:
+        tree_dict: The dictionary produced by treelib.tree.Tree.to_dict
+
+    Returns:
+        The same dictionary, now JSON serialisable
+    """
+    stack = [tree_dict]
+    while stack:
+        for node_dict in stack.pop().values():
+            node_data = node_dict.get("data")
+            if isinstance(node_data, ClickNode):
+                node_dict["data"] = node_data.as_dict()
+            stack.extend(node_dict.get("children", []))
+    return tree_dict
+
+
+class ClickTreeViz:  # pylint:disable=too-many-instance-attributes
     """
     This class is used to traverse the nested CLI structure of a click Click object
     and then provide several mechanisms for visualising or exporting the CLI structure
     """
 
-    def __init__(self, click_stuct: Union[MultiCommand, Group]):
+    # The number of exporter outputs (one per method and arguments) kept in memory
+    export_cache_size = 32
+
+    def __init__(
+        self,
+        click_stuct: Union[MultiCommand, Group],
+        max_depth: Optional[int] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        root: Optional[str] = None,
+    ):
         """
-        The constructor for this class accepts a nested Click CLI object
+        The constructor for this class accepts a nested Click CLI object. The object
+        is traversed read-only, it is neither copied nor modified. Lazy MultiCommands
+        are expanded during construction, so the renderers' selection arguments do
+        not avoid loading them, whereas max_depth and root do.
         Args:
             click_stuct: The structure to traverse and convert
+            max_depth: If provided, commands nested deeper than this (below the root,
+                if one is given) are not expanded. This avoids loading the sub commands
+                of lazy MultiCommands below it
+            instrumentation: If provided, records the time spent in each stage
+            root: If provided, only the subtree of this command (e.g. 'ship.move') and
+                the groups leading to it are traversed, so lazy MultiCommands beside
+                them are not loaded. The same nodes as the renderers' root and
+                max_depth arguments select are kept
+
+        Raises:
+            KeyError: If there is no command at the root path
         """
-        # Copy value just in case
-        self._raw_struct = deepcopy(click_stuct)
+        self.instrumentation = instrumentation
+
+        # Traversal only reads from the Click object, so hold a reference to the
+        # original rather than paying for a copy of its entire object graph
+        self._raw_struct = click_stuct
 
         # Flat list of ClickNode objects
-        self._list_leaf_nodes = recurse_click_cli(click_structure=self._raw_struct)
+        with self._stage("traverse") as stats:
+            if root is None:
+                nodes = recurse_click_cli(click_structure=self._raw_struct, max_depth=max_depth)
+            else:
+                nodes = list(iter_click_subtree(self._raw_struct, root=root, max_depth=max_depth))
+            if stats:
+                stats.nodes = len(nodes)
+
+        self._build(nodes)
+
+    @classmethod
+    def from_import_path(  # pylint:disable=too-many-arguments
+        cls,
+        import_path: str,
+        executor: Optional["Executor"] = None,
+        max_depth: Optional[int] = None,
+        cache: Optional["TreeCache"] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        extra_paths: Sequence[str] = (),
+    ) -> "ClickTreeViz":
+        """
+        This alternative constructor imports the Click object itself and, when an
+        executor is provided, discovers each top level sub command in its workers.
+        The resulting tree is identical to constructing the class from the object.
+
+        When a cache is provided and the CLI's source is unchanged since it was last
+        cached, the nodes are loaded from disk and the CLI is not imported at all. The
+        source covers the CLI's top level package, the extra paths and every other
+        module loaded in this process when the entry was stored. Plugins which are
+        only imported by executor workers are not seen, so pass their location in
+        extra_paths.
+        Args:
+            import_path: The location of the Click object, e.g. 'package.module:cli'
+            executor: If provided, the executor used to discover the sub commands
+            max_depth: If provided, commands nested deeper than this are not expanded
+            cache: If provided, the on-disk cache to read from and populate
+            instrumentation: If provided, records the time spent in each stage
+            extra_paths: Any further files or directories the CLI is built from, which
+                the cache fingerprint should cover, e.g. plugins outside its package
+
+        Returns:
+            The constructed ClickTreeViz object
+        """
+        instance = cls.__new__(cls)
+        instance.instrumentation = instrumentation
+
+        with instance._stage("cache_lookup"):
+            cache_key = (
+                cache.fingerprint(import_path, max_depth=max_depth, extra_paths=extra_paths)
+                if cache
+                else None
+            )
+            nodes = cache.get(cache_key) if cache else None
+
+        if nodes is None:
+            with instance._stage("traverse") as stats:
+                nodes = discover_click_cli(import_path, executor=executor, max_depth=max_depth)
+                if stats:
+                    stats.nodes = len(nodes)
+            instance._raw_struct = import_click_object(import_path)
+            if cache:
+                from click_tree_viz.cache import (  # pylint:disable=import-outside-toplevel
+                    loaded_source_files,
+                )
+
+                with instance._stage("cache_store", nodes=len(nodes)):
+                    cache.put(cache_key, nodes, dependencies=loaded_source_files())
+        else:
+            # Nothing was imported, there is no Click object to refer to
+            instance._raw_struct = None
+
+        instance._build(nodes)
+        return instance
+
+    @classmethod
+    def from_snapshot(
+        cls, snapshot: CliSnapshot, instrumentation: Optional[Instrumentation] = None
+    ) -> "ClickTreeViz":
+        """
+        This alternative constructor wraps a snapshot, e.g. one received from another
+        process, without importing or traversing the CLI again. The nodes are shared
+        with the snapshot rather than copied.
+        Args:
+            snapshot: The snapshot to wrap
+            instrumentation: If provided, records the time spent in each stage
+
+        Returns:
+            The constructed ClickTreeViz object
+        """
+        instance = cls.__new__(cls)
+        instance.instrumentation = instrumentation
+        instance._raw_struct = None
+        instance._build(snapshot._tree)  # pylint:disable=protected-access
+        return instance
+
+    @classmethod
+    def from_binary(
+        cls, path: str, instrumentation: Optional[Instrumentation] = None
+    ) -> "ClickTreeViz":
+        """
+        This alternative constructor reads a tree written by write_binary, without
+        importing the CLI. To look up a few commands without reading every node, use
+        BinaryTree.open(path) instead.
+        Args:
+            path: The location of the file
+            instrumentation: If provided, records the time spent in each stage
 
-        # Convert to treelib.tree.Tree structure
-        self._treelib_obj = self._as_tree(node_sequence=self._list_leaf_nodes)
-        self._treelib_obj_params = self._extend_leaf_params(treelib_obj=self._treelib_obj)
+        Returns:
+            The constructed ClickTreeViz object
+
+        Raises:
+            ValueError: If the file does not hold a tree in this version of the format
+        """
+        instance = cls.__new__(cls)
+        instance.instrumentation = instrumentation
+        instance._raw_struct = None
+
+        with instance._stage("load_binary") as stats:
+            with BinaryTree.open(path) as binary_tree:
+                nodes = list(binary_tree)
+            if stats:
+                stats.nodes = len(nodes)
+
+        instance._build(nodes)
+        return instance
+
+    def snapshot(self) -> CliSnapshot:
+        """
+        Freezes the tree into an immutable, hashable and picklable CliSnapshot, which
+        can be read from many threads at once. The nodes are shared rather than copied.
+        """
+        return CliSnapshot(self._tree)
+
+    def _build(self, node_sequence: Sequence[ClickNode]):
+        """Builds the tree structures from the flat list of ClickNode objects"""
+        # Array-backed tree over the ClickNode objects, which every exporter walks
+        with self._stage("build_tree", nodes=len(node_sequence)):
+            self._tree = as_flat_tree(node_sequence)
+
+        # Query indexes and subtree digests, built on first use
+        self._index = None
+        self._digests = None
+
+        # Exporter outputs, memoized per method and arguments
+        self._export_cache = _ExportCache(max_size=self.export_cache_size)
+
+    def _stage(self, name: str, nodes: Optional[int] = None):
+        """
+        Measures a stage if instrumentation is enabled. Otherwise a shared no-op
+        context manager is returned, so that disabled instrumentation costs nothing.
+        """
+        if self.instrumentation is None:
+            return NULL_STAGE
+        return self.instrumentation.stage(name, nodes=nodes)
+
+    def to_treelib(self, params: bool = False) -> "treelib.tree.Tree":
+        """
+        This method converts the CLI to a treelib object, for compatibility with code
+        written against treelib. A new object is built on every call.
+        Args:
+            params: If each parameter should be added as a leaf of its command
+
+        Returns:
+            The treelib object, with the ClickNode objects stored as node data
+        """
+        return self._tree.to_treelib(params=params)
 
-        # Graphviz method provided by treelib yields once only
-        self._graphviz_cached = None
+    @property
+    def index(self) -> CliIndex:
+        """
+        The query indexes over the CLI, e.g. tree.index.with_option("--dry-run") or
+        tree.index.children("ship"). They are built on first access.
+        """
+        if self._index is None:
+            with self._stage("index", nodes=len(self._tree)):
+                self._index = CliIndex(self._tree)
+        return self._index
 
-    @staticmethod
-    def _as_tree(node_sequence: List[ClickNode]) -> treelib.tree.Tree:
+    def diff(self, other: "ClickTreeViz") -> List["DiffRecord"]:
         """
-        This method constructs a list of Click leaf nodes (custom dataclass)
-        to a Treelib object.
+        This method compares this CLI (the earlier version) with another one (the
+        later version), e.g. to catch breaking changes between two releases. Only
+        the parts of the CLI which differ are visited.
         Args:
-            node_sequence: The list of nodes that need to be created as a treelib object
+            other: The later version of the CLI
 
         Returns:
-            The constructed treelib object
-
-        """
-        # Use tree lib to take clean struct and hold in memory
-        working_tree = treelib.tree.Tree()
-        working_tree.create_node(identifier="CLI")
-        for leaf in node_sequence:
-            working_tree.create_node(
-                identifier=leaf.path,
-                tag=leaf.name,
-                data=leaf.as_dict(),
-                parent="CLI" if leaf.is_root else leaf.parent_path,
+            The added, removed and changed commands and parameters
+        """
+        from click_tree_viz.diff_utils import (  # pylint:disable=import-outside-toplevel
+            diff_trees,
+        )
+
+        return diff_trees(
+            before_index=self.index,
+            before_digests=self._subtree_digests(),
+            after_index=other.index,
+            after_digests=other._subtree_digests(),  # pylint:disable=protected-access
+        )
+
+    def _subtree_digests(self) -> Dict[str, "NodeDigests"]:
+        """The Merkle-style digests of every subtree, computed on first use"""
+        if self._digests is None:
+            with self._stage("digests", nodes=len(self._tree)):
+                from click_tree_viz.diff_utils import (  # pylint:disable=import-outside-toplevel
+                    subtree_digests,
+                )
+
+                self._digests = subtree_digests(self._tree)
+        return self._digests
+
+    def clear_export_cache(self):
+        """Discards every memoized exporter output so that it is recomputed on next use"""
+        self._export_cache.clear()
+
+    def _select(
+        self,
+        root: Optional[str] = None,
+        max_depth: Optional[int] = None,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None,
+    ) -> FlatTree:
+        """
+        Selects the part of the tree to render, visiting only that part. The whole tree
+        is returned as is when nothing is filtered.
+        """
+        if root is None and max_depth is None and not include and not exclude:
+            return self._tree
+        with self._stage("select", nodes=len(self._tree)):
+            return self._tree.select(
+                root=root, max_depth=max_depth, include=include, exclude=exclude
             )
 
-        return working_tree
-
-    @staticmethod
-    def _extend_leaf_params(treelib_obj: treelib.tree.Tree) -> treelib.tree.Tree:
-        """Add parameters and commands to the tree structure"""
-
-        # Copy so working with different reference
-        working_treelib_obj = deepcopy(treelib_obj)
-
-        # Iterate over each node
-        for node in treelib_obj.nodes:
-            # Retrieve node object
-            working_node = treelib_obj[node]
-            # Filter to nodes with data property
-            if working_node.data is not None:
-                params = working_node.data.get("params", [])
-                for param in params:
-                    # Join any multi-options
-                    opts = ",".join(param["opts"])
-                    # Add to copied tree
-                    working_treelib_obj.create_node(
-                        identifier=working_node.identifier + "." + opts,
-                        tag=f'[{param["type"]}] {opts}',
-                        parent=node,
+    def to_dict(  # pylint:disable=too-many-arguments
+        self,
+        nid: Optional[str] = None,
+        key: Optional[Callable] = None,
+        sort: bool = True,
+        reverse: bool = False,
+        root: Optional[str] = None,
+        max_depth: Optional[int] = None,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Converts nodes to the dictionary structure of treelib's to_dict, accepting the
+        same selection arguments as the renderers. A new dictionary is built on every
+        call, which is cheaper than copying a memoized one, so it can be modified freely.
+        """
+        tree = self._select(root=root, max_depth=max_depth, include=include, exclude=exclude)
+        with self._stage("to_dict", nodes=len(tree)):
+            if key is not None or tree.find(nid or ROOT_ID) is None:
+                # Sort keys are written against treelib nodes, and treelib reports
+                # unknown nodes in its own way
+                return _serialise_node_data(
+                    tree.to_treelib().to_dict(
+                        nid=nid, key=key, sort=sort, reverse=reverse, with_data=True
                     )
-        return working_treelib_obj
+                )
+            return build_dict(tree, nid=nid, sort=sort, reverse=reverse)
+
+    @_memoize_export
+    def to_json(  # pylint:disable=too-many-arguments
+        self,
+        sort: bool = True,
+        reverse: bool = False,
+        root: Optional[str] = None,
+        max_depth: Optional[int] = None,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None,
+    ) -> str:
+        """
+        Converts nodes to a JSON structure identical to the to_dict one, accepting the
+        same selection arguments as write_json
+        """
+        # The stage is recorded by the memoization, so the module writer is used directly
+        tree = self._select(root=root, max_depth=max_depth, include=include, exclude=exclude)
+        stream = io.StringIO()
+        write_json(tree, stream, sort=sort, reverse=reverse)
+        return stream.getvalue()
 
-    def to_dict(self, **kwargs) -> Dict[str, Any]:
-        """Uses treelib to convert nodes to a dictionary structure"""
-        return self._treelib_obj.to_dict(with_data=True, **kwargs)
+    def write_json(  # pylint:disable=too-many-arguments
+        self,
+        file_obj: TextIO,
+        ndjson: bool = False,
+        sort: bool = True,
+        reverse: bool = False,
+        root: Optional[str] = None,
+        max_depth: Optional[int] = None,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None,
+    ):
+        """
+        This method streams the CLI as JSON to a file-like object, without building
+        the nested dictionary or the complete document in memory first
 
-    def to_json(self, **kwargs) -> str:
-        """Uses treelib to convert nodes to a JSON structure"""
-        return self._treelib_obj.to_json(with_data=True, **kwargs)
+        Args:
+            file_obj: The file-like object to write to
+            ndjson: If true, newline delimited JSON is written instead, with one record
+                (path, parent, name, is_group, params and help) per command
+            sort: If siblings should be sorted by name (nested JSON only)
+            reverse: If sorted siblings should be in descending order (nested JSON only)
+            root: If provided, only the subtree of this command (e.g. 'ship.move') and
+                the groups leading to it are rendered
+            max_depth: If provided, commands nested deeper than this below the root are
+                left out
+            include: If provided, glob patterns of the commands to render (with their
+                subtrees), e.g. 'ship.*'
+            exclude: If provided, glob patterns of the commands to leave out (with their
+                subtrees)
+        """
+        tree = self._select(root=root, max_depth=max_depth, include=include, exclude=exclude)
+        with self._stage("write_ndjson" if ndjson else "write_json", nodes=len(tree)):
+            if ndjson:
+                write_ndjson(tree, file_obj)
+            else:
+                write_json(tree, file_obj, sort=sort, reverse=reverse)
 
-    def to_graphviz(self, shape: str = "plain", layout_dir: str = "LR", **kwargs) -> str:
+    def write_binary(
+        self,
+        file_obj: BinaryIO,
+        root: Optional[str] = None,
+        max_depth: Optional[int] = None,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None,
+    ):
         """
-        This method leverages the treelib graphviz function, but instead of printing
-        to the stdout this is captured and returned as a string object. Additionally
-        the returned graphviz definition is extended to add a layout direction
+        This method writes the CLI in the compact binary format of binary_utils, which
+        from_binary and BinaryTree read back without importing the CLI
 
         Args:
+            file_obj: The binary file-like object to write to, e.g. open(path, "wb")
+            root: If provided, only the subtree of this command (e.g. 'ship.move') and
+                the groups leading to it are written
+            max_depth: If provided, commands nested deeper than this below the root are
+                left out
+            include: If provided, glob patterns of the commands to write (with their
+                subtrees), e.g. 'ship.*'
+            exclude: If provided, glob patterns of the commands to leave out (with their
+                subtrees)
+        """
+        tree = self._select(root=root, max_depth=max_depth, include=include, exclude=exclude)
+        with self._stage("write_binary", nodes=len(tree)):
+            write_binary(tree, file_obj)
+
+    def write_graphviz(  # pylint:disable=too-many-arguments
+        self,
+        file_obj: TextIO,
+        shape: str = "plain",
+        layout_dir: str = "LR",
+        shapes: Optional[Dict[str, str]] = None,
+        cluster: bool = False,
+        graph: str = "digraph",
+        root: Optional[str] = None,
+        max_depth: Optional[int] = None,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None,
+    ):
+        """
+        This method streams a graphviz (dot language) definition of the CLI, with a
+        leaf for each parameter, to a file-like object
+
+        Args:
+            file_obj: The file-like object to write to
             shape: The shape to render each node
             layout_dir: The direction which the tree will render
-            **kwargs: Any extra arguments to pass to treelib.tree.Tree.to_graphviz
+            shapes: Overrides of the shape per kind of node, the kinds being 'cli' (the
+                root), 'group', 'command', 'option' and 'argument'
+            cluster: If each group and its descendants should be drawn as a cluster
+            graph: The type of graph, e.g. 'digraph'
+            root: If provided, only the subtree of this command (e.g. 'ship.move') and
+                the groups leading to it are rendered
+            max_depth: If provided, commands nested deeper than this below the root are
+                left out
+            include: If provided, glob patterns of the commands to render (with their
+                subtrees), e.g. 'ship.*'
+            exclude: If provided, glob patterns of the commands to leave out (with their
+                subtrees)
+        """
+        tree = self._select(root=root, max_depth=max_depth, include=include, exclude=exclude)
+        with self._stage("write_graphviz", nodes=len(tree)):
+            write_dot(
+                tree,
+                file_obj,
+                shape=shape,
+                layout_dir=layout_dir,
+                shapes=shapes,
+                cluster=cluster,
+                graph=graph,
+            )
+
+    @_memoize_export
+    def to_graphviz(  # pylint:disable=too-many-arguments
+        self,
+        shape: str = "plain",
+        layout_dir: str = "LR",
+        shapes: Optional[Dict[str, str]] = None,
+        cluster: bool = False,
+        graph: str = "digraph",
+        root: Optional[str] = None,
+        max_depth: Optional[int] = None,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None,
+    ) -> str:
+        """
+        This method returns a graphviz (dot language) definition of the CLI, with a
+        leaf for each parameter, as a string object
+
+        Args:
+            shape: The shape to render each node
+            layout_dir: The direction which the tree will render
+            shapes: Overrides of the shape per kind of node, the kinds being 'cli' (the
+                root), 'group', 'command', 'option' and 'argument'
+            cluster: If each group and its descendants should be drawn as a cluster
+            graph: The type of graph, e.g. 'digraph'
+            root: If provided, only the subtree of this command (e.g. 'ship.move') and
+                the groups leading to it are rendered
+            max_depth: If provided, commands nested deeper than this below the root are
+                left out
+            include: If provided, glob patterns of the commands to render (with their
+                subtrees), e.g. 'ship.*'
+            exclude: If provided, glob patterns of the commands to leave out (with their
+                subtrees)
 
         Returns:
             A string of graphviz configuration ready for rendering in another tool
         """
+        # The stage is recorded by the memoization, so the module writer is used directly
+        tree = self._select(root=root, max_depth=max_depth, include=include, exclude=exclude)
+        stream = io.StringIO()
+        write_dot(
+            tree,
+            stream,
+            shape=shape,
+            layout_dir=layout_dir,
+            shapes=shapes,
+            cluster=cluster,
+            graph=graph,
+        )
+        return stream.getvalue()
 
-        # If graphviz object is already generated, retrieve cached version
-        if self._graphviz_cached is not None:
-            return self._graphviz_cached
+    @_memoize_export
+    def _show(
+        self,
+        root: Optional[str] = None,
+        max_depth: Optional[int] = None,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None,
+        **kwargs,
+    ) -> str:
+        """Renders the tree as text, identically to the treelib show function"""
+        tree = self._select(root=root, max_depth=max_depth, include=include, exclude=exclude)
+        native = set(kwargs) <= {"nid", "idhidden", "reverse", "line_type"}
+        if native and tree.find(kwargs.get("nid") or ROOT_ID) is not None:
+            return render_text(tree, **kwargs)
+        # Filters, sort keys and data properties are written against treelib nodes, and
+        # treelib reports unknown nodes in its own way
+        return tree.to_treelib(params=True).show(stdout=False, **kwargs)
 
-        # treelib graphviz writes once to stdout
-        stream = io.StringIO()
-        with redirect_stdout(stream):
-            self._treelib_obj_params.to_graphviz(shape=shape, **kwargs)
-        output = stream.getvalue()
+    def print(  # pylint:disable=too-many-arguments
+        self,
+        stdout: bool = True,
+        root: Optional[str] = None,
+        max_depth: Optional[int] = None,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None,
+        **kwargs,
+    ) -> Optional[str]:
+        """
+        Prints the tree as text
+        Args:
+            stdout: If false, the text is returned rather than printed
+            root: If provided, only the subtree of this command (e.g. 'ship.move') and
+                the groups leading to it are rendered
+            max_depth: If provided, commands nested deeper than this below the root are
+                left out
+            include: If provided, glob patterns of the commands to render (with their
+                subtrees), e.g. 'ship.*'
+            exclude: If provided, glob patterns of the commands to leave out (with their
+                subtrees)
+            **kwargs: The arguments of the treelib show function, e.g. line_type
+        """
+        text = self._show(
+            root=root, max_depth=max_depth, include=include, exclude=exclude, **kwargs
+        )
+        if not stdout:
+            return text
+        print(text)
 
-        # Replace closing } tag with layout condition
-        output_with_layout = output.replace("}", f'rankdir="{layout_dir}";\n}}')
+    def _rich_tree(
+        self,
+        root: Optional[str] = None,
+        max_depth: Optional[int] = None,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None,
+    ):
+        """
+        Converts the tree to a rich.tree.Tree object. Rich trees are modified through
+        their add method, so a new one is built on every call rather than memoized
+        """
+        from click_tree_viz.rich_utils import (  # pylint:disable=import-outside-toplevel
+            build_rich_tree,
+        )
 
-        # save to attr so that we can call >1x
-        self._graphviz_cached = output_with_layout
-        return self._graphviz_cached
+        tree = self._select(root=root, max_depth=max_depth, include=include, exclude=exclude)
+        with self._stage("rich_tree", nodes=len(tree)):
+            return build_rich_tree(tree, return_obj=True)
 
-    def print(self, **kwargs):
-        """Uses built in treelib print function"""
-        return self._treelib_obj_params.show(**kwargs)
+    def rich_print(  # pylint:disable=too-many-arguments
+        self,
+        return_object: bool = False,
+        root: Optional[str] = None,
+        max_depth: Optional[int] = None,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None,
+        chunked: bool = False,
+        pager: bool = False,
+    ):
+        """
+        Converts the tree to a rich.tree.Tree object and prints it to the console
+        Args:
+            return_object: If true, the rich object is returned rather than printed
+            root: If provided, only the subtree of this command (e.g. 'ship.move') and
+                the groups leading to it are rendered
+            max_depth: If provided, commands nested deeper than this below the root are
+                left out
+            include: If provided, glob patterns of the commands to render (with their
+                subtrees), e.g. 'ship.*'
+            exclude: If provided, glob patterns of the commands to leave out (with their
+                subtrees)
+            chunked: If true, each top level command is built and printed in turn,
+                rather than building the whole tree first. Output starts sooner and
+                memory stays bounded on very large CLIs
+            pager: If true, the output is shown in the system pager (e.g. less)
+        """
+        if chunked and not return_object:
+            from click_tree_viz.rich_utils import (  # pylint:disable=import-outside-toplevel
+                print_rich_trees,
+            )
 
-    def rich_print(self, return_object: bool = False):
-        """Converts treelib structure to rich.tree.Tree object
-        and prints it to the console"""
+            tree = self._select(root=root, max_depth=max_depth, include=include, exclude=exclude)
+            with self._stage("rich_print", nodes=len(tree)):
+                print_rich_trees(tree, pager=pager)
+            return None
 
-        result = build_rich_tree(self._treelib_obj, return_obj=return_object)
+        result = self._rich_tree(root=root, max_depth=max_depth, include=include, exclude=exclude)
         if return_object:
             return result
+        if result is not None:
+            from rich.console import Console  # pylint:disable=import-outside-toplevel
+
+            console = Console()
+            with self._stage("rich_print", nodes=len(self._tree)), ExitStack() as stack:
+                if pager:
+                    stack.enter_context(console.pager(styles=True))
+                console.print(result)
+
+    def render_many(
+        self,
+        exporters: Sequence[Union[str, Exporter]],
+        root: Optional[str] = None,
+        max_depth: Optional[int] = None,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None,
+    ) -> List[Any]:
+        """
+        Renders the tree in several formats from a single traversal, e.g.
+
+            json_str, dot_str = tree.render_many(["json", "dot"])
+
+        Args:
+            exporters: The registered names of the formats (see register_exporter), or
+                configured Exporter objects, e.g. DotExporter(cluster=True)
+            root: If provided, only the subtree of this command (e.g. 'ship.move') and
+                the groups leading to it are rendered
+            max_depth: If provided, commands nested deeper than this below the root are
+                left out
+            include: If provided, glob patterns of the commands to render (with their
+                subtrees), e.g. 'ship.*'
+            exclude: If provided, glob patterns of the commands to leave out (with their
+                subtrees)
+
+        Returns:
+            The output of each format, in the same order
+
+        Raises:
+            ValueError: If a name is not a registered format
+        """
+        exporters = [create_exporter(x) if isinstance(x, str) else x for x in exporters]
+        tree = self._select(root=root, max_depth=max_depth, include=include, exclude=exclude)
+        with self._stage("render_many", nodes=len(tree)):
+            return visit(tree, exporters)
+
+    @classmethod
+    async def abuild(
+        cls,
+        click_stuct: Union[MultiCommand, Group],
+        max_depth: Optional[int] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        executor: Optional["Executor"] = None,
+    ) -> "ClickTreeViz":
+        """
+        Constructs the tree in an executor, so that traversing a large CLI doesn't
+        block the event loop, e.g. tree = await ClickTreeViz.abuild(cli)
+        Args:
+            click_stuct: The structure to traverse and convert
+            max_depth: If provided, commands nested deeper than this are not expanded
+            instrumentation: If provided, records the time spent in each stage
+            executor: If provided, the executor to construct the tree in. Otherwise
+                the event loop's default (thread pool) executor is used
+
+        Returns:
+            The constructed ClickTreeViz object
+        """
+        return await _run_in_executor(
+            executor, cls, click_stuct, max_depth=max_depth, instrumentation=instrumentation
+        )
+
+    async def arender_many(  # pylint:disable=too-many-arguments
+        self,
+        exporters: Sequence[Union[str, Exporter]],
+        executor: Optional["Executor"] = None,
+        root: Optional[str] = None,
+        max_depth: Optional[int] = None,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None,
+    ) -> List[Any]:
+        """
+        Renders the tree in several formats in an executor, see render_many, e.g.
+        rich_tree, = await tree.arender_many(["rich"])
+        Args:
+            exporters: The registered names of the formats, or Exporter objects
+            executor: If provided, the executor to render in. Otherwise the event
+                loop's default (thread pool) executor is used
+            root: If provided, only the subtree of this command (e.g. 'ship.move') and
+                the groups leading to it are rendered
+            max_depth: If provided, commands nested deeper than this below the root are
+                left out
+            include: If provided, glob patterns of the commands to render (with their
+                subtrees), e.g. 'ship.*'
+            exclude: If provided, glob patterns of the commands to leave out (with their
+                subtrees)
+
+        Returns:
+            The output of each format, in the same order
+        """
+        return await _run_in_executor(
+            executor,
+            self.render_many,
+            exporters,
+            root=root,
+            max_depth=max_depth,
+            include=include,
+            exclude=exclude,
+        )
+
+    async def astream(  # pylint:disable=too-many-arguments
+        self,
+        output_format: str = "json",
+        batch_size: int = 256,
+        root: Optional[str] = None,
+        max_depth: Optional[int] = None,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None,
+        **options,
+    ) -> AsyncIterator[str]:
+        """
+        Streams the tree as text, handing control back to the event loop between
+        batches so that a large render doesn't stall other tasks, e.g.
+
+            async for chunk in tree.astream("ndjson"):
+                await response.write(chunk.encode())
+
+        Args:
+            output_format: One of 'json', 'ndjson' or 'text'
+            batch_size: How many pieces of the document (e.g. ndjson lines) make a chunk
+            root: If provided, only the subtree of this command (e.g. 'ship.move') and
+                the groups leading to it are rendered
+            max_depth: If provided, commands nested deeper than this below the root are
+                left out
+            include: If provided, glob patterns of the commands to render (with their
+                subtrees), e.g. 'ship.*'
+            exclude: If provided, glob patterns of the commands to leave out (with their
+                subtrees)
+            **options: The options of the format, e.g. sort for 'json' or line_type for
+                'text'
+
+        Returns:
+            An asynchronous iterator of strings which concatenate to the document
+
+        Raises:
+            ValueError: If the format cannot be streamed
+        """
+        import asyncio  # pylint:disable=import-outside-toplevel
+
+        iter_chunks = _STREAMS.get(output_format)
+        if iter_chunks is None:
+            raise ValueError(f"Unknown format {output_format!r}, expected one of {list(_STREAMS)}")
+
+        tree = await _run_in_executor(
+            None, self._select, root=root, max_depth=max_depth, include=include, exclude=exclude
+        )
+        chunks = iter_chunks(tree, **options)
+        while True:
+            batch = "".join(itertools.islice(chunks, batch_size))
+            if not batch:
+                return
+            yield batch
+            await asyncio.sleep(0)
@@ -2,24 +2,176 @@
 This module provides utilities for traversing Click CLI structure
 """
 
-from typing import Union, Dict, Any, List, Optional
-from dataclasses import dataclass
+import importlib
+import sys
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Union, Dict, Any, List, Optional, Iterator, Sequence, Tuple
+from weakref import WeakValueDictionary
 
-from click import Command, Group, MultiCommand
+from click import Command, Context, Group, MultiCommand
+
+if TYPE_CHECKING:  # pragma: no cover
+    from concurrent.futures import Executor
+
+# The identifier of the node above the top level commands in every rendered tree
+ROOT_ID = "CLI"
+
+# Interned parameter specs, shared by every node with an identical parameter
+_PARAM_SPECS: "WeakValueDictionary[tuple, ParamSpec]" = WeakValueDictionary()
+
+_PARAM_KEYS = ("type", "name", "opts")
+_PARAM_KEYS_WITH_HELP = _PARAM_KEYS + ("help",)
+
+
+def _intern(value: Any) -> Any:
+    """Interns strings so that repeated names and options share one object"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class ParamSpec(Mapping):
+    """
+    This class stores the metadata of a single Click parameter. Identical parameters,
+    such as a --verbose option shared by many commands, are interned so that every
+    node refers to the same immutable instance. It can be read like the dictionary
+    it represents, e.g. param["opts"] or param.get("help").
+    """
+
+    __slots__ = ("type", "name", "opts", "help", "_keys", "__weakref__")
+
+    type: str
+    name: Optional[str]
+    opts: Tuple[str, ...]
+    help: Optional[str]
+    _keys: Tuple[str, ...]
+
+    @classmethod
+    def intern(
+        cls,
+        param_type: str,
+        name: Optional[str],
+        opts: Sequence[str],
+        help_text: Optional[str] = None,
+        has_help: bool = False,
+    ) -> "ParamSpec":
+        """
+        This method retrieves the shared instance for the given parameter metadata,
+        creating it if this is the first parameter of its kind
+        Args:
+            param_type: The Click parameter type name, e.g. 'option' or 'argument'
+            name: The name of the parameter
+            opts: The option strings of the parameter
+            help_text: The help text of the parameter
+            has_help: If the parameter supports help text (arguments do not)
+
+        Returns:
+            The interned parameter spec
+        """
+        opts = tuple(_intern(x) for x in opts)
+        key = (param_type, name, opts, help_text, has_help)
+        param_spec = _PARAM_SPECS.get(key)
+        if param_spec is None:
+            param_spec = object.__new__(cls)
+            values = (
+                _intern(param_type),
+                _intern(name),
+                opts,
+                help_text,
+                _PARAM_KEYS_WITH_HELP if has_help else _PARAM_KEYS,
+            )
+            for attr, value in zip(cls.__slots__, values):
+                object.__setattr__(param_spec, attr, value)
+            param_spec = _PARAM_SPECS.setdefault(key, param_spec)
+        return param_spec
+
+    @classmethod
+    def from_dict(cls, param: Mapping) -> "ParamSpec":
+        """Retrieves the shared instance for a parameter in its dictionary form"""
+        if isinstance(param, ParamSpec):
+            return param
+        return cls.intern(
+            param_type=param["type"],
+            name=param["name"],
+            opts=param["opts"],
+            help_text=param.get("help"),
+            has_help="help" in param,
+        )
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._keys:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, ParamSpec):
+            return self is other or self._fields() == other._fields()
+        if isinstance(other, Mapping):
+            return self.as_dict() == dict(other)
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self._fields())
+
+    def __setattr__(self, key: str, value: Any):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        return ParamSpec.from_dict, (self.as_dict(),)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.as_dict()!r})"
+
+    def _fields(self) -> tuple:
+        return self.type, self.name, self.opts, self.help, self._keys
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Convenience method which returns this object as a JSON serialisable one"""
+        param = {"type": self.type, "name": self.name, "opts": list(self.opts)}
+        if len(self._keys) > len(_PARAM_KEYS):
+            param["help"] = self.help
+        return param
 
 
-@dataclass
 class ClickNode:
     """
-    This dataclass stores relevant metadata for each Click command type in a format
-    easy to manipulate and work with
+    This class stores relevant metadata for each Click command type in a compact,
+    immutable format easy to manipulate and work with. Names are interned, the path
+    is computed once and parameters are shared ParamSpec instances.
     """
 
+    __slots__ = ("name", "route", "params", "is_group", "help", "path")
+
     name: str
-    route: List[str]
-    params: List[Dict[str, Any]]
+    route: Tuple[str, ...]
+    params: Tuple[ParamSpec, ...]
     is_group: bool
-    help: Optional[str] = None
+    help: Optional[str]
+    path: str
+
+    def __init__(
+        self,
+        name: str,
+        route: Sequence[str],
+        params: Sequence[Mapping],
+        is_group: bool,
+        help: Optional[str] = None,  # pylint:disable=redefined-builtin
+    ):
+        route = tuple(_intern(x) for x in route)
+        values = (
+            _intern(name),
+            route,
+            tuple(ParamSpec.from_dict(x) for x in params),
+            is_group,
+            help,
+            ".".join(route),
+        )
+        for attr, value in zip(self.__slots__, values):
+            object.__setattr__(self, attr, value)
 
     @property
     def is_root(self) -> bool:
@@ -30,82 +182,346 @@ class ClickNode:
     def parent_path(self) -> str:
         """The route to the object directly above this one in the CLI tree"""
         if len(self.route) > 1:
-            return ".".join(self.route[:-1])
+            # The path minus the trailing '.name'
+            return self.path[: -len(self.route[-1]) - 1]
         return self.route[0]  # pragma: no cover
 
-    @property
-    def path(self) -> str:
-        """The route to this object in the CLI tree"""
-        return ".".join(self.route)
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, ClickNode):
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    def __hash__(self) -> int:
+        return hash(self._fields())
+
+    def __setattr__(self, key: str, value: Any):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        return ClickNode, self._fields()
+
+    def __repr__(self) -> str:
+        fields = ", ".join(
+            f"{attr}={value!r}" for attr, value in zip(self.__slots__, self._fields())
+        )
+        return f"{type(self).__name__}({fields})"
+
+    def _fields(self) -> tuple:
+        return self.name, self.route, self.params, self.is_group, self.help
 
     def as_dict(self) -> Dict[str, Any]:
         """Convenience method which returns this object as a JSON serialisable one"""
-        return self.__dict__
+        return {
+            "name": self.name,
+            "route": list(self.route),
+            "params": [x.as_dict() for x in self.params],
+            "is_group": self.is_group,
+            "help": self.help,
+        }
+
+
+def _is_lazy(cli_obj: Any) -> bool:
+    """Detects if cli obj only exposes its sub commands through the MultiCommand protocol"""
+    return isinstance(cli_obj, MultiCommand) and not hasattr(cli_obj, "commands")
+
+
+def _resolve_context(
+    cli_obj: Any, name: Optional[str], parent: Optional[Context]
+) -> Optional[Context]:
+    """
+    Lazy MultiCommands need a click Context in order to list and load their sub
+    commands, so one is created for them only. Other objects inherit the nearest one.
+    """
+    if _is_lazy(cli_obj):
+        return Context(cli_obj, info_name=name, parent=parent)
+    return parent
+
+
+def _iter_lazy_commands(
+    cli_obj: MultiCommand, ctx: Optional[Context]
+) -> Iterator[Tuple[str, Command]]:
+    """Loads each sub command through the MultiCommand protocol only once it is reached"""
+    for name in cli_obj.list_commands(ctx):
+        sub_command = cli_obj.get_command(ctx, name)
+        if sub_command is not None:
+            yield name, sub_command
+
+
+def _iter_commands(
+    cli_obj: Union[Dict[str, Any], Command, Group, MultiCommand], ctx: Optional[Context] = None
+) -> Iterator[Tuple[str, Command]]:
+    """Aids traversal by exposing the sub commands of any cli obj as (name, command) pairs"""
+    if hasattr(cli_obj, "commands"):
+        return iter(cli_obj.commands.items())
+
+    if isinstance(cli_obj, dict):
+        return iter(cli_obj.items())
+
+    if isinstance(cli_obj, MultiCommand):
+        return _iter_lazy_commands(cli_obj, ctx)
+
+    return iter(())
+
+
+def _list_command_names(
+    cli_obj: Union[Dict[str, Any], Command, Group, MultiCommand], ctx: Optional[Context] = None
+) -> List[str]:
+    """Lists the names of the sub commands of any cli obj without loading lazy ones"""
+    if hasattr(cli_obj, "commands"):
+        return list(cli_obj.commands)
+
+    if isinstance(cli_obj, dict):
+        return list(cli_obj)
 
+    if isinstance(cli_obj, MultiCommand):
+        return list(cli_obj.list_commands(ctx))
 
-def _as_dict(cli_obj: Union[Dict[str, Any], Command, Group]) -> Union[Dict[str, Any]]:
-    """Aids recursion so that recursion focuses on dictionary objects"""
+    return []
+
+
+def _get_command(
+    cli_obj: Union[Dict[str, Any], Command, Group, MultiCommand],
+    name: str,
+    ctx: Optional[Context] = None,
+) -> Optional[Command]:
+    """Retrieves (loading if lazy) a single sub command of any cli obj by name"""
     if hasattr(cli_obj, "commands"):
-        return cli_obj.commands
+        return cli_obj.commands.get(name)
 
     if isinstance(cli_obj, dict):
-        return cli_obj
+        return cli_obj.get(name)
 
-    return {}
+    if isinstance(cli_obj, MultiCommand):
+        return cli_obj.get_command(ctx, name)
+
+    return None
 
 
 def _is_group(cli_obj: Union[Group, Command, MultiCommand]) -> bool:
-    """Detects if cli obj is a Group or not"""
-    return isinstance(cli_obj, Group) and hasattr(cli_obj, "commands")
+    """Detects if cli obj is a Group (or any other kind of MultiCommand) or not"""
+    return isinstance(cli_obj, MultiCommand)
 
 
-def _get_params(cli_obj: Union[Group, Command, MultiCommand]) -> List[Dict[str, Any]]:
+def _get_params(cli_obj: Union[Group, Command, MultiCommand]) -> Tuple[ParamSpec, ...]:
     """This method extracts parameters from the cli object"""
-    return [
-        {
-            **dict(type=x.param_type_name, name=x.name, opts=x.opts),
-            **(dict(help=x.help) if hasattr(x, "help") else {}),
-        }
+    return tuple(
+        ParamSpec.intern(
+            param_type=x.param_type_name,
+            name=x.name,
+            opts=x.opts,
+            help_text=getattr(x, "help", None),
+            has_help=hasattr(x, "help"),
+        )
         for x in cli_obj.params
-    ]
+    )
+
+
+def _make_node(name: str, route: Sequence[str], click_obj: Command) -> ClickNode:
+    """Extracts the metadata of a single Click command as a ClickNode"""
+    return ClickNode(
+        name=name,
+        route=route,
+        is_group=_is_group(click_obj),
+        params=_get_params(click_obj),
+        help=click_obj.help,
+    )
+
+
+def import_click_object(import_path: str) -> Union[Command, Group, MultiCommand]:
+    """
+    This method imports a Click object from a path in the 'package.module:attribute'
+    format used by console script entry points
+    Args:
+        import_path: The location of the Click object
+
+    Returns:
+        The imported Click object
+    """
+    module_name, _, attr_path = import_path.partition(":")
+    if not module_name or not attr_path:
+        raise ValueError(f"Expected an import path like 'module:attribute', got {import_path!r}")
+
+    click_obj = importlib.import_module(module_name)
+    for attr in attr_path.split("."):
+        click_obj = getattr(click_obj, attr)
+    return click_obj
+
+
+def iter_click_nodes(
+    click_structure: Union[Dict[str, Any], Command, Group, MultiCommand],
+    current_path: List[Any] = None,
+    max_depth: Optional[int] = None,
+) -> Iterator[ClickNode]:
+    """
+    This method performs a depth first traversal of the Click CLI object using an
+    explicit stack, yielding the metadata of each node as soon as it is reached.
+    Consumers can therefore stream nodes or stop early without the whole CLI tree
+    being visited, and deeply nested CLIs are not bound by the recursion limit.
+
+    MultiCommands which load their sub commands lazily (via ``list_commands`` and
+    ``get_command``) are only expanded once the traversal reaches them.
+    Args:
+        click_structure: The CLI structure to traverse
+        current_path: The route leading to the structure, if it is not the top level
+        max_depth: If provided, nodes with a route longer than this are not expanded
+
+    Returns:
+        An iterator of nodes and associated metadata in depth first order
+
+    """
+    # Each frame holds the route shared by its children, their pending items and
+    # the click context needed to expand lazy MultiCommands
+    route = tuple(current_path or ())
+    if max_depth is not None and len(route) >= max_depth:
+        return
+
+    ctx = _resolve_context(click_structure, getattr(click_structure, "name", None), None)
+    stack = [(route, _iter_commands(click_structure, ctx), ctx)]
+
+    while stack:
+        route_prefix, pending, parent_ctx = stack[-1]
+        for clean_name, click_obj in pending:
+            route = route_prefix + (clean_name,)
+            node = _make_node(name=clean_name, route=route, click_obj=click_obj)
+            yield node
+
+            # Descend before visiting the remaining siblings, the node's interned
+            # route doubles as the prefix of its own children
+            if max_depth is None or len(node.route) < max_depth:
+                ctx = _resolve_context(click_obj, clean_name, parent_ctx)
+                stack.append((node.route, _iter_commands(click_obj, ctx), ctx))
+                break
+        else:
+            stack.pop()
+
+
+def iter_click_subtree(
+    click_structure: Union[Dict[str, Any], Command, Group, MultiCommand],
+    root: str,
+    max_depth: Optional[int] = None,
+) -> Iterator[ClickNode]:
+    """
+    This method traverses only the subtree of a single command, yielding the groups
+    leading to it, the command itself and its descendants in depth first order, i.e.
+    the nodes FlatTree.select(root=...) keeps. Only the commands on the way to the
+    root are loaded, so lazy MultiCommands beside them are never expanded.
+    Args:
+        click_structure: The CLI structure to traverse
+        root: The dot separated route to the command, e.g. 'ship.move'
+        max_depth: If provided, commands nested deeper than this below the root are
+            not expanded, e.g. 1 yields the root's direct children only
+
+    Returns:
+        An iterator of nodes and associated metadata in depth first order
+
+    Raises:
+        KeyError: If there is no command at the root path
+    """
+    click_obj = click_structure
+    ctx = _resolve_context(click_obj, getattr(click_obj, "name", None), None)
+    route: Tuple[str, ...] = ()
+    while True:
+        # Names may contain dots, so the first command whose path starts the root
+        # path is followed, as FlatTree.find does
+        path = ".".join(route)
+        remainder = root[len(path) + 1 :] if route else root
+        names = _list_command_names(click_obj, ctx)
+        name = next((x for x in names if remainder == x or remainder.startswith(x + ".")), None)
+        sub_command = None if name is None else _get_command(click_obj, name, ctx)
+        if sub_command is None:
+            raise KeyError(root)
+
+        node = _make_node(name=name, route=route + (name,), click_obj=sub_command)
+        yield node
+        if remainder == name:
+            break
+        click_obj, route = sub_command, node.route
+        ctx = _resolve_context(click_obj, name, ctx)
+
+    # As in FlatTree.select, the depth is counted from the root
+    if max_depth is not None:
+        max_depth += len(node.route)
+    yield from iter_click_nodes(sub_command, current_path=node.route, max_depth=max_depth)
 
 
 def recurse_click_cli(
     click_structure: Union[Dict[str, Any], Command, Group, MultiCommand],
     current_path: List[Any] = None,
     all_paths: List[Any] = None,
+    max_depth: Optional[int] = None,
 ) -> List[ClickNode]:
     """
     This method performs a depth first traversal of the Click CLI object in order
     to retrieve the relevant metadata from each node
     Args:
-        click_structure: The CLI structure to process in each iteration
-        current_path: The path exhausted in each recursion
-        all_paths: The complete list of paths exhausted in all recursions thus far
+        click_structure: The CLI structure to process
+        current_path: The route leading to the structure, if it is not the top level
+        all_paths: An existing list of nodes to extend with the nodes found
+        max_depth: If provided, nodes with a route longer than this are not expanded
 
     Returns:
         A list of all nodes and associated metadata for the entire CLI tree
 
     """
-    if current_path is None and all_paths is None:
-        current_path = []
+    if all_paths is None:
         all_paths = []
 
-    for clean_name, click_obj in _as_dict(click_structure).items():
-        all_paths.append(
-            ClickNode(
-                name=clean_name,
-                route=current_path + [clean_name],
-                is_group=_is_group(click_obj),
-                params=_get_params(click_obj),
-                help=click_obj.help,
-            )
-        )
-
-        # Recurse down
-        recurse_click_cli(
-            click_structure=_as_dict(click_obj),
-            current_path=(current_path + [clean_name]),
-            all_paths=all_paths,
-        )
+    all_paths.extend(
+        iter_click_nodes(click_structure, current_path=current_path, max_depth=max_depth)
+    )
     return all_paths
+
+
+def _discover_subtree(import_path: str, name: str, max_depth: Optional[int]) -> List[ClickNode]:
+    """
+    This method traverses a single top level sub command of the Click object found at
+    the import path. It runs in executor workers, so it is kept at module level and
+    imports the CLI itself rather than receiving it.
+    """
+    click_structure = import_click_object(import_path)
+    ctx = _resolve_context(click_structure, getattr(click_structure, "name", None), None)
+    click_obj = _get_command(click_structure, name, ctx)
+    if click_obj is None:
+        return []
+
+    node = _make_node(name=name, route=(name,), click_obj=click_obj)
+    return [node] + recurse_click_cli(
+        click_structure=click_obj, current_path=node.route, max_depth=max_depth
+    )
+
+
+def discover_click_cli(
+    import_path: str,
+    executor: Optional["Executor"] = None,
+    max_depth: Optional[int] = None,
+) -> List[ClickNode]:
+    """
+    This method retrieves the same nodes as recurse_click_cli for the Click object at
+    the given import path, but discovers each top level sub command independently.
+    When an executor is provided (e.g. a ProcessPoolExecutor) the sub commands, and
+    any plugin modules they import, are loaded and traversed in its workers.
+    Args:
+        import_path: The location of the Click object, e.g. 'package.module:cli'
+        executor: If provided, the executor used to discover the sub commands
+        max_depth: If provided, nodes with a route longer than this are not expanded
+
+    Returns:
+        A list of all nodes in the same depth first order as recurse_click_cli
+
+    """
+    if max_depth is not None and max_depth < 1:
+        return []
+
+    click_structure = import_click_object(import_path)
+    ctx = _resolve_context(click_structure, getattr(click_structure, "name", None), None)
+    names = _list_command_names(click_structure, ctx)
+
+    # Both map implementations yield results in submission order
+    map_func = map if executor is None else executor.map
+    subtrees = map_func(
+        _discover_subtree,
+        [import_path] * len(names),
+        names,
+        [max_depth] * len(names),
+    )
+    return [node for subtree in subtrees for node in subtree]
@@ -0,0 +1,188 @@
+"""
+This module provides a structural comparison of two versions of a Click CLI, which
+uses Merkle-style subtree hashes to skip every part of the CLI that is unchanged
+"""
+
+import hashlib
+import json
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from click_tree_viz.click_utils import ClickNode, ParamSpec
+from click_tree_viz.query import CliIndex
+
+# The digest of a node itself and of the node together with its whole subtree
+NodeDigests = Tuple[bytes, bytes]
+
+
+@dataclass(frozen=True)
+class DiffRecord:
+    """
+    This dataclass describes a single difference between two versions of a CLI
+    """
+
+    change: str  # 'added', 'removed' or 'changed'
+    kind: str  # 'group', 'command', 'option' or 'argument'
+    path: str  # The route to the command (or the command owning the parameter)
+    param: Optional[str] = None  # The name of the parameter, if one is concerned
+    attribute: Optional[str] = None  # The attribute which changed, e.g. 'help'
+    before: Any = None
+    after: Any = None
+
+
+def _node_kind(node: ClickNode) -> str:
+    return "group" if node.is_group else "command"
+
+
+def _own_digest(node: ClickNode) -> bytes:
+    """Hashes the name, kind, help and parameters of a node, ignoring its children"""
+    payload = [node.name, node.is_group, node.help, [x.as_dict() for x in node.params]]
+    return hashlib.sha256(json.dumps(payload).encode()).digest()
+
+
+def subtree_digests(node_sequence: Sequence[ClickNode]) -> Dict[str, NodeDigests]:
+    """
+    This method hashes every node, and every subtree, of the CLI. The subtree digest
+    of a node covers its own digest and those of its children (sorted by name, so
+    that declaration order does not matter), hence two subtrees are identical
+    exactly when their subtree digests are.
+    Args:
+        node_sequence: The nodes of the CLI in depth first order
+
+    Returns:
+        A mapping of each path to the digests of its node and its subtree
+    """
+    child_digests: Dict[Optional[str], List[Tuple[str, bytes]]] = {}
+    digests = {}
+
+    # Children follow their parent in depth first order, so reversing it completes
+    # every child before its parent is reached
+    for node in reversed(node_sequence):
+        own = _own_digest(node)
+        subtree = hashlib.sha256(own)
+        for _, child_digest in sorted(child_digests.pop(node.path, [])):
+            subtree.update(child_digest)
+
+        digests[node.path] = (own, subtree.digest())
+        parent_path = None if node.is_root else node.parent_path
+        child_digests.setdefault(parent_path, []).append((node.name, digests[node.path][1]))
+    return digests
+
+
+def _params_by_opts(node: ClickNode) -> Dict[Tuple[str, ...], Tuple[str, ParamSpec]]:
+    """
+    Maps the option strings of each parameter, which are unique within a command, to
+    its label and spec. Names are not unique: the flags of a flag-value option such as
+    --moored/--drifting share one. The label is the name unless it is shared like this.
+    """
+    names = Counter(x["name"] for x in node.params)
+    return {
+        tuple(x["opts"]): (
+            x["name"] if x["name"] and names[x["name"]] == 1 else ",".join(x["opts"]),
+            x,
+        )
+        for x in node.params
+    }
+
+
+def _diff_node(before: ClickNode, after: ClickNode) -> List[DiffRecord]:
+    """Compares the attributes and parameters of a command present in both versions"""
+    records = []
+    for attribute in ("is_group", "help"):
+        if getattr(before, attribute) != getattr(after, attribute):
+            records.append(
+                DiffRecord(
+                    change="changed",
+                    kind=_node_kind(after),
+                    path=after.path,
+                    attribute=attribute,
+                    before=getattr(before, attribute),
+                    after=getattr(after, attribute),
+                )
+            )
+
+    before_params = _params_by_opts(before)
+    after_params = _params_by_opts(after)
+    for opts, (label, param) in before_params.items():
+        if opts not in after_params:
+            records.append(
+                DiffRecord(change="removed", kind=param["type"], path=before.path, param=label)
+            )
+            continue
+
+        after_label, after_param = after_params[opts]
+        for attribute in ("type", "name", "help"):
+            if param.get(attribute) != after_param.get(attribute):
+                records.append(
+                    DiffRecord(
+                        change="changed",
+                        kind=after_param["type"],
+                        path=after.path,
+                        param=after_label,
+                        attribute=attribute,
+                        before=param.get(attribute),
+                        after=after_param.get(attribute),
+                    )
+                )
+
+    for opts, (label, param) in after_params.items():
+        if opts not in before_params:
+            records.append(
+                DiffRecord(change="added", kind=param["type"], path=after.path, param=label)
+            )
+    return records
+
+
+def diff_trees(
+    before_index: CliIndex,
+    before_digests: Dict[str, NodeDigests],
+    after_index: CliIndex,
+    after_digests: Dict[str, NodeDigests],
+) -> List[DiffRecord]:
+    """
+    This method compares two versions of a CLI. Subtrees whose digests match are
+    skipped without being descended into, so the cost of the comparison depends on
+    the size of what changed rather than on the size of the CLI.
+    Args:
+        before_index: The query index of the earlier version
+        before_digests: The subtree digests of the earlier version
+        after_index: The query index of the later version
+        after_digests: The subtree digests of the later version
+
+    Returns:
+        The differences, group by group in depth first order. Added or removed
+        groups are reported once, not once per command below them.
+    """
+    records = []
+    # Paths of the groups (None being the root) whose children need comparing
+    stack: List[Optional[str]] = [None]
+    while stack:
+        parent_path = stack.pop()
+        before_children = {x.name: x for x in before_index.children(parent_path)}
+        after_children = {x.name: x for x in after_index.children(parent_path)}
+
+        descend = []
+        for name, before in before_children.items():
+            if name not in after_children:
+                records.append(
+                    DiffRecord(change="removed", kind=_node_kind(before), path=before.path)
+                )
+
+        for name, after in after_children.items():
+            before = before_children.get(name)
+            if before is None:
+                records.append(DiffRecord(change="added", kind=_node_kind(after), path=after.path))
+                continue
+
+            # Identical subtrees need no further comparison
+            if before_digests[before.path] == after_digests[after.path]:
+                continue
+            if before_digests[before.path][0] != after_digests[after.path][0]:
+                records.extend(_diff_node(before, after))
+            if before.is_group or after.is_group:
+                descend.append(after.path)
+
+        # Reversed so that the first child is compared first
+        stack.extend(reversed(descend))
+    return records
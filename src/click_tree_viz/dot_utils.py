@@ -0,0 +1,129 @@
+"""
+This module provides the graphviz dot language rendering of a Click CLI, which is
+streamed to any file-like object
+"""
+
+import io
+from typing import Dict, List, Optional, Sequence, TextIO
+
+from click_tree_viz.click_utils import ROOT_ID, ClickNode
+from click_tree_viz.exporters import Exporter, visit
+from click_tree_viz.flat_tree import param_id, param_label
+
+
+def _quote(value: str) -> str:
+    """Quotes a dot ID, escaping the characters which would otherwise end it"""
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'"{escaped}"'
+
+
+def _node_kind(node: ClickNode) -> str:
+    return "group" if node.is_group else "command"
+
+
+class DotExporter(Exporter):  # pylint:disable=too-many-instance-attributes
+    """
+    This class renders the CLI structure, including a leaf per parameter, as a dot
+    language graph. Statements are written as they are produced, only the nodes are
+    kept until the edges are written, and no global state is touched, so it is safe
+    to use concurrently.
+    """
+
+    def __init__(  # pylint:disable=too-many-arguments
+        self,
+        file_obj: Optional[TextIO] = None,
+        shape: str = "plain",
+        layout_dir: str = "LR",
+        shapes: Optional[Dict[str, str]] = None,
+        cluster: bool = False,
+        graph: str = "digraph",
+    ):
+        """
+        Args:
+            file_obj: If provided, the file-like object to write to. Otherwise the
+                graph is collected and returned as a string.
+            shape: The shape to render each node
+            layout_dir: The direction which the tree will render
+            shapes: Overrides of the shape per kind of node, the kinds being 'cli'
+                (the root), 'group', 'command', 'option' and 'argument'
+            cluster: If each group and its descendants should be drawn as a cluster
+            graph: The type of graph, e.g. 'digraph'
+        """
+        self.file_obj = file_obj
+        self.shape = shape
+        self.layout_dir = layout_dir
+        self.shapes = shapes or {}
+        self.cluster = cluster
+        self.graph = graph
+        self._out: TextIO = file_obj
+        self._open_clusters = 0
+        self._nodes: List[ClickNode] = []
+
+    def _write_node(self, node_id: str, label: str, kind: str):
+        node_shape = self.shapes.get(kind, self.shape)
+        indent = "\t" * (self._open_clusters + 1)
+        self._out.write(f"{indent}{_quote(node_id)} [label={_quote(label)}, shape={node_shape}]\n")
+
+    def start(self):
+        self._out = io.StringIO() if self.file_obj is None else self.file_obj
+        self._open_clusters = 0
+        self._nodes = []
+        self._out.write(f"{self.graph} tree {{\n")
+        self._out.write(f"\trankdir={_quote(self.layout_dir)};\n")
+        self._write_node(ROOT_ID, ROOT_ID, "cli")
+
+    def enter(self, node: ClickNode):
+        if self.cluster and node.is_group:
+            indent = "\t" * (self._open_clusters + 1)
+            self._out.write(f'{indent}subgraph {_quote("cluster_" + node.path)} {{\n')
+            self._out.write(f"{indent}\tlabel={_quote(node.name)};\n")
+            self._open_clusters += 1
+
+        self._write_node(node.path, node.name, _node_kind(node))
+        for param in node.params:
+            self._write_node(param_id(node, param), param_label(param), param["type"])
+        self._nodes.append(node)
+
+    def leave(self, node: ClickNode):
+        if self.cluster and node.is_group:
+            self._open_clusters -= 1
+            self._out.write("\t" * (self._open_clusters + 1) + "}\n")
+
+    def finish(self) -> Optional[str]:
+        # Edges are written outside of any cluster, so that they don't pull nodes into one
+        self._out.write("\n")
+        # Undirected graphs (e.g. 'graph' or 'strict graph') only accept undirected edges
+        edge = "->" if self.graph.split()[-1] == "digraph" else "--"
+        for node in self._nodes:
+            parent_id = ROOT_ID if node.is_root else node.parent_path
+            self._out.write(f"\t{_quote(parent_id)} {edge} {_quote(node.path)}\n")
+            for param in node.params:
+                self._out.write(f"\t{_quote(node.path)} {edge} {_quote(param_id(node, param))}\n")
+        self._out.write("}\n")
+        self._nodes = []
+        return self._out.getvalue() if self.file_obj is None else None
+
+
+def write_dot(  # pylint:disable=too-many-arguments
+    node_sequence: Sequence[ClickNode],
+    file_obj: TextIO,
+    shape: str = "plain",
+    layout_dir: str = "LR",
+    shapes: Optional[Dict[str, str]] = None,
+    cluster: bool = False,
+    graph: str = "digraph",
+):
+    """
+    This method writes the CLI structure as a dot language graph, see DotExporter
+    Args:
+        node_sequence: The nodes of the CLI in depth first order
+        file_obj: The file-like object to write to
+        shape: The shape to render each node
+        layout_dir: The direction which the tree will render
+        shapes: Overrides of the shape per kind of node, the kinds being 'cli' (the
+            root), 'group', 'command', 'option' and 'argument'
+        cluster: If each group and its descendants should be drawn as a cluster
+        graph: The type of graph, e.g. 'digraph'
+    """
+    exporter = DotExporter(file_obj, shape, layout_dir, shapes, cluster, graph)
+    visit(node_sequence, [exporter])
@@ -0,0 +1,140 @@
+"""
+This module provides the visitor interface implemented by every output format, a
+registry of the formats by name and the single traversal which feeds any number
+of them at once
+"""
+
+import importlib
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Union
+
+from click_tree_viz.click_utils import ClickNode
+from click_tree_viz.flat_tree import FlatTree, as_flat_tree
+
+
+class Exporter:
+    """
+    This class is the base of every output format. A traversal calls start once,
+    then enter and leave for every command in depth first (declaration) order, so
+    that a group is left only after all of its descendants, and finally finish.
+    Subclasses override the callbacks they need, the defaults do nothing.
+
+    Formats needing random access to the tree (e.g. to sort siblings) set whole_tree
+    and override render instead, which is handed the tree the traversal walks.
+    """
+
+    whole_tree = False
+
+    def render(self, tree: FlatTree) -> Any:  # pylint:disable=unused-argument
+        """Called instead of the callbacks when whole_tree is set, returning the output"""
+        return None
+
+    def start(self):
+        """Called once, before the first command is entered"""
+
+    def enter(self, node: ClickNode):
+        """Called for each command, before any of its sub commands"""
+
+    def leave(self, node: ClickNode):
+        """Called for each command, after all of its sub commands"""
+
+    def finish(self) -> Any:
+        """Called once after the last command was left, returning the output"""
+        return None
+
+
+# Built-in formats are referenced by import path, so that e.g. rich is only
+# imported once its format is requested
+_EXPORTERS: Dict[str, Union[str, Callable[..., Exporter]]] = {
+    "dict": "click_tree_viz.json_utils:DictExporter",
+    "json": "click_tree_viz.json_utils:JsonExporter",
+    "ndjson": "click_tree_viz.json_utils:NdjsonExporter",
+    "dot": "click_tree_viz.dot_utils:DotExporter",
+    "text": "click_tree_viz.text_utils:TextExporter",
+    "rich": "click_tree_viz.rich_utils:RichExporter",
+}
+
+
+def register_exporter(name: str, factory: Optional[Callable[..., Exporter]] = None):
+    """
+    This method registers an output format, replacing any registered under the same
+    name. It can be used as a class decorator, e.g. @register_exporter("markdown").
+    Args:
+        name: The name of the format, as passed to ClickTreeViz.render_many
+        factory: The Exporter subclass, or a callable returning an Exporter
+
+    Returns:
+        The factory, or a decorator registering one if it was not provided
+    """
+    if factory is None:
+        return lambda x: register_exporter(name, x)
+    _EXPORTERS[name] = factory
+    return factory
+
+
+def available_exporters() -> List[str]:
+    """The names of the registered formats"""
+    return sorted(_EXPORTERS)
+
+
+def create_exporter(name: str, **options) -> Exporter:
+    """
+    Args:
+        name: The name of a registered format
+        **options: The options of the format, e.g. cluster=True for 'dot'
+
+    Returns:
+        A new exporter of the format
+
+    Raises:
+        ValueError: If no format is registered under the name
+    """
+    factory = _EXPORTERS.get(name)
+    if factory is None:
+        raise ValueError(f"Unknown format {name!r}, expected one of {available_exporters()}")
+    if isinstance(factory, str):
+        module_name, _, attr = factory.partition(":")
+        factory = getattr(importlib.import_module(module_name), attr)
+    return factory(**options)
+
+
+def visit(node_sequence: Iterable[ClickNode], exporters: Sequence[Exporter]) -> List[Any]:
+    """
+    This method walks the nodes once, feeding every exporter along the way. The
+    exporters setting whole_tree are instead rendered from the same FlatTree, which
+    is only built if the nodes are not one already.
+    Args:
+        node_sequence: The nodes of the CLI in depth first order
+        exporters: The exporters to feed
+
+    Returns:
+        The output of each exporter, in the same order
+    """
+    tree: Optional[FlatTree] = None
+    if any(x.whole_tree for x in exporters):
+        node_sequence = tree = as_flat_tree(node_sequence)
+    fed = [x for x in exporters if not x.whole_tree]
+    if not fed:
+        return [x.render(tree) for x in exporters]
+
+    for exporter in fed:
+        exporter.start()
+
+    # The entered commands which have not been left yet, innermost last
+    open_nodes: List[ClickNode] = []
+    for node in node_sequence:
+        # Depth first order means a command is complete once a node is not below it
+        while open_nodes and len(open_nodes[-1].route) >= len(node.route):
+            closed = open_nodes.pop()
+            for exporter in fed:
+                exporter.leave(closed)
+
+        for exporter in fed:
+            exporter.enter(node)
+        open_nodes.append(node)
+
+    while open_nodes:
+        closed = open_nodes.pop()
+        for exporter in fed:
+            exporter.leave(closed)
+
+    return [x.render(tree) if x.whole_tree else x.finish() for x in exporters]
@@ -0,0 +1,256 @@
+"""
+This module provides the array-backed tree which holds the structure of a Click
+CLI, with parent and child positions stored in flat arrays rather than per node
+objects
+"""
+
+from array import array
+from bisect import bisect_right
+from collections.abc import Sequence
+from fnmatch import fnmatchcase
+from typing import TYPE_CHECKING, Iterable, List, Optional
+
+from click_tree_viz.click_utils import ROOT_ID, ClickNode, ParamSpec
+
+if TYPE_CHECKING:  # pragma: no cover
+    import treelib
+
+# The position of the (virtual) root of the CLI, which has no ClickNode
+ROOT = -1
+
+
+def param_id(node: ClickNode, param: ParamSpec) -> str:
+    """The identifier of a parameter's leaf below its command, e.g. 'ship.new.name'"""
+    return node.path + "." + ",".join(param["opts"])
+
+
+def param_label(param: ParamSpec) -> str:
+    """The label of a parameter's leaf, e.g. '[option] --speed'"""
+    return f'[{param["type"]}] {",".join(param["opts"])}'
+
+
+class FlatTree(Sequence):
+    """
+    This class holds the nodes of a CLI in depth first order alongside three arrays
+    of positions: the parent of each node, and the children of every node stored
+    contiguously (child_indices) with the offset of each node's run (child_offsets).
+    The tree costs a few bytes per node on top of the nodes themselves, instead of
+    the node objects and dictionaries treelib allocates.
+
+    It is a sequence of its ClickNode objects, so it can be passed wherever the flat
+    list of nodes is expected.
+    """
+
+    __slots__ = ("_nodes", "parents", "child_offsets", "child_indices")
+
+    def __init__(self, node_sequence: Iterable[ClickNode]):
+        """
+        Args:
+            node_sequence: The nodes of the CLI in depth first order
+
+        Raises:
+            ValueError: If a node is not directly below one which precedes it
+        """
+        self._nodes = tuple(node_sequence)
+
+        # The position of the latest node at each depth, i.e. the open ancestors
+        ancestors = []
+        child_counts = [0] * (len(self._nodes) + 1)
+        self.parents = array("i")
+        for position, node in enumerate(self._nodes):
+            depth = len(node.route) - 1
+            if depth > len(ancestors):
+                raise ValueError(f"The parent of '{node.path}' does not precede it")
+            del ancestors[depth:]
+            parent = ancestors[-1] if ancestors else ROOT
+            self.parents.append(parent)
+            child_counts[parent + 1] += 1
+            ancestors.append(position)
+
+        # Slot 0 belongs to the root, the slot of every other node is its position + 1
+        self.child_offsets = array("i", [0])
+        for count in child_counts:
+            self.child_offsets.append(self.child_offsets[-1] + count)
+
+        # Depth first order fills each run in declaration order
+        free_slots = self.child_offsets[:-1]
+        self.child_indices = array("i", [0]) * len(self._nodes)
+        for position, parent in enumerate(self.parents):
+            self.child_indices[free_slots[parent + 1]] = position
+            free_slots[parent + 1] += 1
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __getitem__(self, position):
+        return self._nodes[position]
+
+    def __reduce__(self):
+        return FlatTree, (self._nodes,)
+
+    def children(self, position: int = ROOT) -> array:
+        """
+        Args:
+            position: The position of a node, or ROOT
+
+        Returns:
+            The positions of the nodes directly below it, in declaration order
+        """
+        start, end = self.child_offsets[position + 1], self.child_offsets[position + 2]
+        return self.child_indices[start:end]
+
+    def find(self, path: str) -> Optional[int]:
+        """
+        This method follows the path down from the root, costing O(depth x breadth)
+        rather than a scan of the tree
+        Args:
+            path: The dot separated route to a command, or ROOT_ID for the root
+
+        Returns:
+            The position of the node, ROOT, or None if there is no such node
+        """
+        if path == ROOT_ID:
+            return ROOT
+
+        position = ROOT
+        while position == ROOT or self._nodes[position].path != path:
+            # Matching on the whole prefix copes with command names containing dots
+            for child in self.children(position):
+                child_path = self._nodes[child].path
+                if path == child_path or path.startswith(child_path + "."):
+                    position = child
+                    break
+            else:
+                return None
+        return position
+
+    def subtree_end(self, position: int) -> int:
+        """
+        Args:
+            position: The position of a node, or ROOT
+
+        Returns:
+            The position after the last node of its subtree. In depth first order the
+            subtree is every position from the node's up to this one.
+        """
+        while position != ROOT:
+            parent = self.parents[position]
+            start, end = self.child_offsets[parent + 1], self.child_offsets[parent + 2]
+            # Siblings are in ascending order, so the next one starts after the subtree
+            next_sibling = bisect_right(self.child_indices, position, start, end)
+            if next_sibling < end:
+                return self.child_indices[next_sibling]
+            position = parent
+        return len(self._nodes)
+
+    def select(
+        self,
+        root: Optional[str] = None,
+        max_depth: Optional[int] = None,
+        include: Optional[Iterable[str]] = None,
+        exclude: Optional[Iterable[str]] = None,
+    ) -> "FlatTree":
+        """
+        This method selects part of the tree, visiting only the subtree of the root
+        and skipping excluded or too deep subtrees without visiting them, so the cost
+        is proportional to what is selected rather than to the size of the tree.
+        Args:
+            root: If provided, the path of the command to select the subtree of. The
+                groups leading to it are kept, so that the subtree stays in place
+            max_depth: If provided, commands nested deeper than this below the root
+                are left out, e.g. 1 keeps the root's direct children only
+            include: If provided, glob patterns of the paths to keep, e.g. 'ship.*'.
+                The subtrees of matching commands are kept, as are the groups leading
+                to them
+            exclude: If provided, glob patterns of the paths to leave out, along with
+                their subtrees
+
+        Returns:
+            A new FlatTree holding the selected nodes
+
+        Raises:
+            KeyError: If there is no command at the root path
+        """
+        start = ROOT if root is None else self.find(root)
+        if start is None:
+            raise KeyError(root)
+
+        include, exclude = list(include or ()), list(exclude or ())
+        base_depth = 0 if start == ROOT else len(self._nodes[start].route)
+
+        # The current node and the groups above it, of which the first `emitted` are
+        # selected. The groups leading to the root are always selected.
+        open_groups = self._ancestors(start)
+        selected = list(open_groups)
+        emitted = len(open_groups)
+        included_until = 0  # Positions before this are within an included subtree
+        position, end = (0, len(self._nodes)) if start == ROOT else (start, self.subtree_end(start))
+        while position < end:
+            node = self._nodes[position]
+            too_deep = max_depth is not None and len(node.route) - base_depth > max_depth
+            if too_deep or _matches(node.path, exclude):
+                position = self.subtree_end(position)
+                continue
+
+            del open_groups[len(node.route) - 1 :]
+            emitted = min(emitted, len(open_groups))
+            open_groups.append(position)
+            if not include or position < included_until or _matches(node.path, include):
+                if include and position >= included_until:
+                    included_until = self.subtree_end(position)
+                selected.extend(open_groups[emitted:])
+                emitted = len(open_groups)
+            position += 1
+
+        return FlatTree(self._nodes[x] for x in selected)
+
+    def _ancestors(self, position: int) -> List[int]:
+        """The positions of the nodes above a node, outermost first"""
+        ancestors = []
+        position = ROOT if position == ROOT else self.parents[position]
+        while position != ROOT:
+            ancestors.append(position)
+            position = self.parents[position]
+        return ancestors[::-1]
+
+    def to_treelib(self, params: bool = False) -> "treelib.tree.Tree":
+        """
+        This method converts the tree to a treelib one, for compatibility. The
+        ClickNode objects are stored as node data.
+        Args:
+            params: If each parameter should be added as a leaf of its command
+
+        Returns:
+            A new treelib object
+        """
+        # treelib is only needed here, so it is imported on first use
+        import treelib  # pylint:disable=import-outside-toplevel,redefined-outer-name
+
+        working_tree = treelib.tree.Tree()
+        working_tree.create_node(identifier=ROOT_ID)
+        for node, parent in zip(self._nodes, self.parents):
+            working_tree.create_node(
+                identifier=node.path,
+                tag=node.name,
+                data=node,
+                parent=ROOT_ID if parent == ROOT else self._nodes[parent].path,
+            )
+
+        # Parameters follow every command, as they always have in the text output
+        for node in self._nodes if params else ():
+            for param in node.params:
+                working_tree.create_node(
+                    identifier=param_id(node, param), tag=param_label(param), parent=node.path
+                )
+        return working_tree
+
+
+def _matches(path: str, patterns: List[str]) -> bool:
+    return any(fnmatchcase(path, x) for x in patterns)
+
+
+def as_flat_tree(node_sequence: Iterable[ClickNode]) -> FlatTree:
+    """Returns the nodes as a FlatTree, without rebuilding one which already is"""
+    if isinstance(node_sequence, FlatTree):
+        return node_sequence
+    return FlatTree(node_sequence)
@@ -0,0 +1,107 @@
+"""
+This module provides opt-in instrumentation which records the wall time, node count
+and (optionally) peak allocations of each internal stage of a ClickTreeViz
+"""
+
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional
+
+
+@dataclass
+class StageStats:
+    """
+    This dataclass holds the measurements of a single run of a stage
+    """
+
+    stage: str
+    seconds: float = 0.0
+    nodes: Optional[int] = None
+    peak_bytes: Optional[int] = None
+
+
+class Instrumentation:
+    """
+    This class collects a StageStats for every stage run by the ClickTreeViz it is
+    passed to, e.g. 'traverse', 'build_tree', each exporter and the rich rendering.
+    Exporters are only measured when their output is computed, not when it is served
+    from the memoized outputs.
+    """
+
+    def __init__(
+        self,
+        callback: Optional[Callable[[StageStats], None]] = None,
+        track_memory: bool = False,
+    ):
+        """
+        Args:
+            callback: If provided, called with each StageStats as soon as it completes
+            track_memory: If peak allocations should be measured with tracemalloc. This
+                slows every stage down noticeably, so it is off by default
+        """
+        self.callback = callback
+        self.track_memory = track_memory
+        self.stages: List[StageStats] = []
+        # The highest traced memory seen by each open stage, outermost first, before
+        # the peak was last reset by a stage nested in it
+        self._open_peaks: List[int] = []
+
+    @contextmanager
+    def stage(self, name: str, nodes: Optional[int] = None) -> Iterator[StageStats]:
+        """
+        This method measures the body of the with statement as a stage. The yielded
+        StageStats can be updated within it, e.g. with a node count only known at
+        the end of the stage.
+        Args:
+            name: The name of the stage
+            nodes: The number of nodes the stage processes, if known up front
+        """
+        stats = StageStats(stage=name, nodes=nodes)
+        started_tracing = False
+        baseline_bytes = 0
+        if self.track_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            elif hasattr(tracemalloc, "reset_peak"):
+                # Nested stages share the tracing of the outermost one, so the peak
+                # is folded into the open stages before it is reset for this one
+                current_peak = tracemalloc.get_traced_memory()[1]
+                self._open_peaks = [max(x, current_peak) for x in self._open_peaks]
+                tracemalloc.reset_peak()
+            baseline_bytes = tracemalloc.get_traced_memory()[0]
+            self._open_peaks.append(0)
+
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.seconds = time.perf_counter() - start
+            if self.track_memory:
+                peak_bytes = max(self._open_peaks.pop(), tracemalloc.get_traced_memory()[1])
+                stats.peak_bytes = peak_bytes - baseline_bytes
+                if started_tracing:
+                    tracemalloc.stop()
+
+            self.stages.append(stats)
+            if self.callback is not None:
+                self.callback(stats)
+
+    def total_seconds(self, name: Optional[str] = None) -> float:
+        """The wall time spent in every recorded stage, or in the named stage only"""
+        return sum(x.seconds for x in self.stages if name is None or x.stage == name)
+
+
+class _NullStage:
+    """Stands in for a stage when instrumentation is disabled, doing nothing at all"""
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *_) -> None:
+        return None
+
+
+NULL_STAGE = _NullStage()
@@ -0,0 +1,253 @@
+"""
+This module provides the JSON renderings of a Click CLI, either nested or as newline
+delimited records, including writers streaming them to any file-like object
+"""
+
+import io
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from click_tree_viz.click_utils import ROOT_ID, ClickNode
+from click_tree_viz.exporters import Exporter, visit
+from click_tree_viz.flat_tree import ROOT, FlatTree, as_flat_tree
+
+
+def _ordered_children(
+    tree: FlatTree, position: int, sort: bool, reverse: bool
+) -> List[Tuple[int, ClickNode]]:
+    """Lists the children of a node with their positions, sorted by name if required"""
+    children = [(x, tree[x]) for x in tree.children(position)]
+    return sorted(children, key=lambda x: x[1].name, reverse=reverse) if sort else children
+
+
+def _ndjson_line(node: ClickNode) -> str:
+    """Serialises the record of a node, ending with a newline"""
+    record = {
+        "path": node.path,
+        "parent": None if node.is_root else node.parent_path,
+        "name": node.name,
+        "is_group": node.is_group,
+        "params": [x.as_dict() for x in node.params],
+        "help": node.help,
+    }
+    return json.dumps(record) + "\n"
+
+
+def iter_ndjson_lines(node_sequence: Iterable[ClickNode]) -> Iterator[str]:
+    """
+    This method produces the newline delimited JSON of the CLI, see NdjsonExporter
+    Args:
+        node_sequence: The nodes of the CLI in depth first order
+
+    Returns:
+        An iterator of lines, each ending with a newline
+    """
+    return (_ndjson_line(x) for x in node_sequence)
+
+
+class DictExporter(Exporter):
+    """
+    This class builds the nested dictionary of the CLI, identical to the one produced
+    by treelib's to_dict(with_data=True) with the ClickNode objects in their
+    dictionary form
+    """
+
+    def __init__(self, sort: bool = True, reverse: bool = False):
+        """
+        Args:
+            sort: If siblings should be sorted by name
+            reverse: If sorted siblings should be in descending order
+        """
+        self.sort = sort
+        self.reverse = reverse
+        self._tree_dict: Dict[str, Any] = {}
+        self._stack: List[Dict[str, Any]] = []
+
+    def start(self):
+        self._tree_dict = {ROOT_ID: {"children": [], "data": None}}
+        self._stack = [self._tree_dict]
+
+    def enter(self, node: ClickNode):
+        node_dict = {node.name: {"children": [], "data": node.as_dict()}}
+        next(iter(self._stack[-1].values()))["children"].append(node_dict)
+        self._stack.append(node_dict)
+
+    def leave(self, node: ClickNode):
+        self._close(self._stack.pop())
+
+    def finish(self) -> Dict[str, Any]:
+        self._close(self._stack.pop())
+        return self._tree_dict
+
+    def _close(self, node_dict: Dict[str, Any]):
+        """Orders the children of a complete node"""
+        content = next(iter(node_dict.values()))
+        if not content["children"]:
+            # As in treelib, a node without children is left without the key
+            del content["children"]
+        elif self.sort:
+            content["children"].sort(key=lambda x: next(iter(x)), reverse=self.reverse)
+
+
+class NdjsonExporter(Exporter):
+    """
+    This class renders the CLI as newline delimited JSON, one record per node in
+    depth first order, e.g. for a search indexer to consume
+    """
+
+    def __init__(self, file_obj: Optional[TextIO] = None):
+        """
+        Args:
+            file_obj: If provided, the file-like object to write to. Otherwise the
+                records are collected and returned as a string.
+        """
+        self.file_obj = file_obj
+        self._buffer: Optional[io.StringIO] = None
+
+    def start(self):
+        self._buffer = io.StringIO() if self.file_obj is None else None
+
+    def enter(self, node: ClickNode):
+        (self._buffer or self.file_obj).write(_ndjson_line(node))
+
+    def finish(self) -> Optional[str]:
+        return None if self._buffer is None else self._buffer.getvalue()
+
+
+def build_dict(
+    node_sequence: Sequence[ClickNode],
+    nid: Optional[str] = None,
+    sort: bool = True,
+    reverse: bool = False,
+) -> Dict[str, Any]:
+    """
+    This method builds the nested dictionary of the CLI, see DictExporter
+    Args:
+        node_sequence: The nodes of the CLI in depth first order
+        nid: If provided, the path of the command to start from rather than the root
+        sort: If siblings should be sorted by name
+        reverse: If sorted siblings should be in descending order
+
+    Returns:
+        The nested dictionary
+
+    Raises:
+        KeyError: If there is no command at the path
+    """
+    tree = as_flat_tree(node_sequence)
+    start = ROOT if nid is None else tree.find(nid)
+    if start is None:
+        raise KeyError(nid)
+
+    exporter = DictExporter(sort=sort, reverse=reverse)
+    if start == ROOT:
+        return visit(tree, [exporter])[0]
+    # The command's subtree is contiguous, and the only child of the root built
+    (tree_dict,) = visit(tree[start : tree.subtree_end(start)], [exporter])
+    return tree_dict[ROOT_ID]["children"][0]
+
+
+def iter_json_chunks(
+    node_sequence: Sequence[ClickNode], sort: bool = True, reverse: bool = False
+) -> Iterator[str]:
+    """
+    This method produces the nested JSON document of the CLI piece by piece. The
+    document is identical to the one produced by treelib's to_json(with_data=True),
+    but neither the nested dictionary nor the complete string is ever built.
+    Args:
+        node_sequence: The nodes of the CLI in depth first order
+        sort: If siblings should be sorted by name
+        reverse: If sorted siblings should be in descending order
+
+    Returns:
+        An iterator of strings which concatenate to the JSON document
+    """
+    tree = as_flat_tree(node_sequence)
+
+    def _ordered(position: int) -> List[Tuple[int, ClickNode]]:
+        return _ordered_children(tree, position, sort, reverse)
+
+    root_children = _ordered(ROOT)
+    if not root_children:
+        yield json.dumps({ROOT_ID: {"data": None}})
+        return
+
+    yield f'{{{json.dumps(ROOT_ID)}: {{"children": ['
+
+    # Each frame holds the pending children, the closing data and the siblings written
+    stack = [(iter(root_children), "null", [0])]
+    while stack:
+        pending, data_json, written = stack[-1]
+        child = next(pending, None)
+        if child is None:
+            stack.pop()
+            yield f'], "data": {data_json}}}}}'
+            continue
+
+        position, node = child
+        if written[0]:
+            yield ", "
+        written[0] += 1
+
+        node_json = json.dumps(node.as_dict())
+        node_children = _ordered(position)
+        if node_children:
+            yield f'{{{json.dumps(node.name)}: {{"children": ['
+            stack.append((iter(node_children), node_json, [0]))
+        else:
+            yield f'{{{json.dumps(node.name)}: {{"data": {node_json}}}}}'
+
+
+class JsonExporter(Exporter):
+    """
+    This class renders the nested JSON document of the CLI, see iter_json_chunks.
+    Siblings may need sorting, so the document is streamed from the whole tree.
+    """
+
+    whole_tree = True
+
+    def __init__(self, file_obj: Optional[TextIO] = None, sort: bool = True, reverse: bool = False):
+        """
+        Args:
+            file_obj: If provided, the file-like object to write to. Otherwise the
+                document is returned as a string.
+            sort: If siblings should be sorted by name
+            reverse: If sorted siblings should be in descending order
+        """
+        self.file_obj = file_obj
+        self.sort = sort
+        self.reverse = reverse
+
+    def render(self, tree: FlatTree) -> Optional[str]:
+        chunks = iter_json_chunks(tree, sort=self.sort, reverse=self.reverse)
+        if self.file_obj is None:
+            return "".join(chunks)
+        for chunk in chunks:
+            self.file_obj.write(chunk)
+        return None
+
+
+def write_json(
+    node_sequence: Sequence[ClickNode], file_obj: TextIO, sort: bool = True, reverse: bool = False
+):
+    """
+    This method streams the nested JSON document of the CLI to a file-like object
+    Args:
+        node_sequence: The nodes of the CLI in depth first order
+        file_obj: The file-like object to write to
+        sort: If siblings should be sorted by name
+        reverse: If sorted siblings should be in descending order
+    """
+    for chunk in iter_json_chunks(node_sequence, sort=sort, reverse=reverse):
+        file_obj.write(chunk)
+
+
+def write_ndjson(node_sequence: Sequence[ClickNode], file_obj: TextIO):
+    """
+    This method streams the CLI to a file-like object as newline delimited JSON, see
+    NdjsonExporter
+    Args:
+        node_sequence: The nodes of the CLI in depth first order
+        file_obj: The file-like object to write to
+    """
+    visit(node_sequence, [NdjsonExporter(file_obj)])
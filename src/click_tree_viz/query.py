@@ -0,0 +1,129 @@
+"""
+This module provides precomputed indexes for querying the structure of a Click CLI
+without scanning every node
+"""
+
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from click_tree_viz.click_utils import ClickNode
+
+
+class _TrieNode:  # pylint:disable=too-few-public-methods
+    """A level of the route trie, holding the node at this route and its children"""
+
+    __slots__ = ("node", "children")
+
+    def __init__(self, node: Optional[ClickNode] = None):
+        self.node = node
+        self.children: Dict[str, "_TrieNode"] = {}
+
+
+class CliIndex:
+    """
+    This class holds lookups over the nodes of a CLI, all built in a single pass:
+    path to node, option string to commands, parameter type to commands and a trie
+    over routes. Lookups cost O(1) or O(depth) rather than a scan of the tree.
+    """
+
+    def __init__(self, node_sequence: Sequence[ClickNode]):
+        """
+        Args:
+            node_sequence: The nodes of the CLI in depth first order
+        """
+        self._by_path: Dict[str, ClickNode] = {}
+        self._by_option: Dict[str, List[ClickNode]] = {}
+        self._by_param_type: Dict[str, List[ClickNode]] = {}
+        self._root = _TrieNode()
+
+        trie_by_path = {}
+        for node in node_sequence:
+            self._by_path[node.path] = node
+
+            for param_type in {x["type"] for x in node.params}:
+                self._by_param_type.setdefault(param_type, []).append(node)
+            options = {opt for x in node.params if x["type"] == "option" for opt in x["opts"]}
+            for option in options:
+                self._by_option.setdefault(option, []).append(node)
+
+            # Depth first order means the parent's trie level already exists
+            parent = self._root if node.is_root else trie_by_path[node.parent_path]
+            trie_by_path[node.path] = parent.children[node.name] = _TrieNode(node)
+
+    def __len__(self) -> int:
+        return len(self._by_path)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._by_path
+
+    def get(self, path: str) -> Optional[ClickNode]:
+        """
+        Args:
+            path: The dot separated route to a command, e.g. 'ship.move'
+
+        Returns:
+            The node at the path, or None if there is no such command
+        """
+        return self._by_path.get(path)
+
+    def with_option(self, option: str) -> List[ClickNode]:
+        """
+        Args:
+            option: An option string, e.g. '--dry-run' or '-n'
+
+        Returns:
+            The commands which accept the option, in depth first order
+        """
+        return list(self._by_option.get(option, []))
+
+    def with_param_type(self, param_type: str) -> List[ClickNode]:
+        """
+        Args:
+            param_type: The Click parameter type name, e.g. 'option' or 'argument'
+
+        Returns:
+            The commands with at least one parameter of the type, in depth first order
+        """
+        return list(self._by_param_type.get(param_type, []))
+
+    def _walk(self, path: Optional[str]) -> Optional[_TrieNode]:
+        """Follows the trie down the route of the path, costing O(depth)"""
+        if not path:
+            return self._root
+        node = self._by_path.get(path)
+        if node is None:
+            return None
+
+        trie_node = self._root
+        for name in node.route:
+            trie_node = trie_node.children[name]
+        return trie_node
+
+    def children(self, path: Optional[str] = None) -> List[ClickNode]:
+        """
+        Args:
+            path: The route to a group, or None for the top level commands
+
+        Returns:
+            The commands directly below the path
+        """
+        trie_node = self._walk(path)
+        return [x.node for x in trie_node.children.values()] if trie_node else []
+
+    def descendants(self, path: Optional[str] = None) -> Iterator[ClickNode]:
+        """
+        This method visits only the subtree below the path
+        Args:
+            path: The route to a group, or None for the whole CLI
+
+        Returns:
+            An iterator of every command below the path, in depth first order
+        """
+        trie_node = self._walk(path)
+        stack = [iter(trie_node.children.values())] if trie_node else []
+        while stack:
+            child = next(stack[-1], None)
+            if child is None:
+                stack.pop()
+                continue
+            yield child.node
+            stack.append(iter(child.children.values()))
@@ -4,16 +4,22 @@ This module provides utilities for building out a complex rich tree representati
 of a Click cli object
 """
 
-from typing import Optional, Dict, Tuple, List, Any
+from contextlib import ExitStack
+from typing import Optional, Dict, Tuple, Iterable, Iterator, List
 
-import treelib
 from rich import box
-from rich.console import Console, RenderGroup, ConsoleRenderable
+from rich.console import Console, ConsoleOptions, ConsoleRenderable, RenderGroup, RenderResult
 from rich.panel import Panel
+from rich.segment import Segment
+from rich.style import Style
+from rich.styled import Styled
 from rich.table import Table
 from rich.text import Text
 from rich.tree import Tree as RichTree
 
+from click_tree_viz.click_utils import ROOT_ID, ClickNode, ParamSpec
+from click_tree_viz.exporters import Exporter, visit
+
 COLOURS = {"group": "[yellow]", "argument": "[cyan]", "option": "[magenta]"}
 
 ICONS = {"command": "⚙️", "group": "📂", "tree": "🌴"}
@@ -21,144 +27,124 @@ ICONS = {"command": "⚙️", "group": "📂", "tree": "🌴"}
 PANEL_MAX_WIDTH = 40
 
 
-def _make_rich_renderable(node_id: str, cli_tree: treelib.Tree) -> ConsoleRenderable:
+class _RenderableCache:
+    """
+    This class memoizes the parameter tables built while rendering a tree. Commands
+    sharing the same parameters (e.g. --verbose and --config with identical help)
+    share a single table, and tables sharing some parameters share their rows. The
+    renderables are only read by rich while rendering, so they can be shared.
     """
-    This method constructs the relevant rich renderable for the the given node
-    identifier. If the node in question has parameters a special table is created,
+
+    def __init__(self):
+        self._tables: Dict[Tuple[ParamSpec, ...], Table] = {}
+        self._rows: Dict[ParamSpec, Tuple[str, Text]] = {}
+
+    def row(self, param: ParamSpec) -> Tuple[str, Text]:
+        """Processes a given param so that it can be visualised as a table row"""
+        row = self._rows.get(param)
+        if row is None:
+            joined_options = ", ".join(param["opts"])
+            resolved_colours = COLOURS.get(param["type"], "")
+            first_col = resolved_colours + joined_options
+            second_col = param.get("help") or ""
+            second_text = Text(second_col, no_wrap=True, overflow="ellipsis")
+            row = self._rows[param] = (first_col, second_text)
+        return row
+
+    def table(self, params: Tuple[ParamSpec, ...]) -> Table:
+        """This method constructs a table in order to detail parameters"""
+        table = self._tables.get(params)
+        if table is None:
+            # Only include the description column if any params have help
+            headers = ["param", "desc"] if any(x.get("help") for x in params) else ["param"]
+            table = Table(
+                *headers, show_lines=False, show_header=True, show_edge=False, box=box.SIMPLE_HEAD,
+            )
+            for param in params:
+                table.add_row(*self.row(param))
+            self._tables[params] = table
+        return table
+
+
+def _make_rich_renderable(node_data: ClickNode, cache: _RenderableCache) -> ConsoleRenderable:
+    """
+    This method constructs the relevant rich renderable for the the given node.
+    If the node in question has parameters a panel holding a table is created,
     otherwise a simple panel is created.
     Args:
-        node_id: The node to process
-        cli_tree:  The treelib Tree structure uses to retrieve metadata
+        node_data: The node to process
+        cache: The parameter tables built so far, which are reused where possible
 
     Returns:
         A rich renderable object
     """
 
-    node_data = cli_tree.nodes[node_id].data
-    is_group = node_data.get("is_group")
-    cmd_desc = node_data.get("help")
-    params = node_data.get("params")
-    title = f'{"" if is_group else ICONS.get("command") + " "}{node_data.get("name")}'
-
-    def _new_simple_panel(text: str, desc: str):
-        """This method constructs a simple text panel if no parameters are present"""
-
-        text_title = [
-            Text(f"{ICONS.get('group')} {text}", no_wrap=True, overflow="ellipsis", style="bold",)
-        ]
-        text_desc = [Text(desc, overflow="ellipsis", style="italic")] if desc else []
-        return Panel.fit(renderable=RenderGroup(*(text_title + text_desc)), width=PANEL_MAX_WIDTH,)
+    cmd_desc = node_data.help or ""
+    title = f'{"" if node_data.is_group else ICONS.get("command") + " "}{node_data.name}'
 
-    def _new_param_tbl(desc: str, text: str, headers: List[str]):
-        """This method constructs a table in order to detail parameters """
+    if node_data.params:
         return Panel.fit(
             renderable=RenderGroup(
-                Text(text, no_wrap=True, overflow="ellipsis", style="bold"),
+                Text(cmd_desc, no_wrap=True, overflow="ellipsis", style="bold"),
                 "\n",
-                Table(
-                    *headers,
-                    show_lines=False,
-                    show_header=True,
-                    show_edge=False,
-                    box=box.SIMPLE_HEAD,
-                ),
+                cache.table(node_data.params),
             ),
-            title=desc,
+            title=title,
             width=PANEL_MAX_WIDTH,
             box=box.ROUNDED,
         )
 
-    def _format_param_row(param: Dict[str, Any]) -> Tuple[str, Text]:
-        """Processes a given param dict so that it can be visualised as a table row"""
-        joined_options = ", ".join(param["opts"])
-        resolved_colours = COLOURS.get(param["type"], "")
-        first_col = resolved_colours + joined_options
-        second_col = param.get("help", "")
-        return first_col, Text(second_col, no_wrap=True, overflow="ellipsis")
-
-    # If any params have 'help' key
-    includes_help = any(x.get("help", False) for x in params)
-    if params and includes_help:
-        component = _new_param_tbl(desc=title, text=cmd_desc, headers=["param", "desc"])
-    # If params are present without any help key
-    elif params:
-        component = _new_param_tbl(desc=title, text=cmd_desc, headers=["param"])
-    else:
-        component = _new_simple_panel(text=title, desc=cmd_desc)
-
-    # If table is present, retrieve it so that we can add rows
-    panels = component.renderable.renderables
-    if params and len(panels) > 0 and isinstance(panels[-1], Table):
-        tbl = panels[-1]
-        for row in map(_format_param_row, params):
-            # Add row to table
-            tbl.add_row(*row)
-
-    return component
-
-
-def _find_or_create_node(
-    parent_node_id: Optional[str],
-    new_node_id: str,
-    rich_tree: RichTree,
-    cli_tree: treelib.Tree,
-    renderable_lookup: Dict[str, str],
-):
-    """
-    This method depth-first recurses down the rich tree and creates nodes if needed
-    Args:
-        parent_node_id: The parent identifier of the node in scope
-        new_node_id: The identifier of the node to create or find
-        rich_tree: The rich tree which needs to be traversed/appended to
-        cli_tree: The treelib structure which can be referenced for metadata
-        renderable_lookup: The mapping of rich IDs to treelib IDs since complex
-            rich objects get silly labels like:
-            "<rich.panel.Panel object at 0x10e5b0160>"
+    # A simple text panel if no parameters are present
+    text_title = [
+        Text(f"{ICONS.get('group')} {title}", no_wrap=True, overflow="ellipsis", style="bold",)
+    ]
+    text_desc = [Text(cmd_desc, overflow="ellipsis", style="italic")] if cmd_desc else []
+    return Panel.fit(renderable=RenderGroup(*(text_title + text_desc)), width=PANEL_MAX_WIDTH,)
 
-    Returns:
-        The rich tree object with the relevant node retrieved (if exists) or created
-    """
 
-    def _resolve_name(r_tree: RichTree, lookup: Dict[str, str]) -> str:
-        return lookup.get(str(r_tree.label))
+def _root_renderable() -> ConsoleRenderable:
+    """Formats the root node"""
+    return Panel.fit(f"{ROOT_ID} tree {ICONS.get('tree')}")
 
-    # Have we found parent?
-    if _resolve_name(rich_tree, renderable_lookup) == parent_node_id:
 
-        # iterate through the children and check for target; BASE CASE 1
-        for child in rich_tree.children:
-            if _resolve_name(child, renderable_lookup) == new_node_id:
-                return child  # pragma: no cover
+class RichExporter(Exporter):
+    """
+    This class converts the CLI to a richly formatted object that can be printed
+    on the console using the 'rich' library. Commands are added in declaration
+    order so that the rich tree mirrors the order the Click commands were declared in.
+    """
 
-        # the parent has bee found, but the child does not exist; BASE CASE 2
-        rich_renderable = _make_rich_renderable(node_id=new_node_id, cli_tree=cli_tree)
+    def __init__(self):
+        self._rich_tree: Optional[RichTree] = None
+        self._handles: List[RichTree] = []
+        self._cache = _RenderableCache()
 
-        # store rich panel lookup for complex objects
-        renderable_lookup[str(rich_renderable)] = new_node_id
+    def start(self):
+        self._rich_tree = RichTree(label=_root_renderable(), highlight=True)
+        # The rich tree handles of the entered commands, the root first
+        self._handles = [self._rich_tree]
+        self._cache = _RenderableCache()
 
-        # Add to rich hierarchy
-        new_rich_tree = rich_tree.add(rich_renderable, highlight=False)
-        return new_rich_tree
+    def enter(self, node: ClickNode):
+        rich_renderable = _make_rich_renderable(node_data=node, cache=self._cache)
+        self._handles.append(self._handles[-1].add(rich_renderable, highlight=False))
 
-    # Keep recursing until we find the parent
-    for child in rich_tree.children:
-        _find_or_create_node(
-            parent_node_id=parent_node_id,
-            new_node_id=new_node_id,
-            rich_tree=child,
-            cli_tree=cli_tree,
-            renderable_lookup=renderable_lookup,
-        )
-    return rich_tree
+    def leave(self, node: ClickNode):
+        self._handles.pop()
+
+    def finish(self) -> RichTree:
+        return self._rich_tree
 
 
-def build_rich_tree(cli_tree: treelib.Tree, return_obj: bool = False) -> Optional[RichTree]:
+def build_rich_tree(
+    node_sequence: Iterable[ClickNode], return_obj: bool = False
+) -> Optional[RichTree]:
     """
-    This method takes a treelib Tree structure constructed by processing the click
-    object and then converts this to a richly formatted object that can be printed
-    on the console using the 'rich' library
+    This method takes the nodes constructed by processing the click object and then
+    converts them to a richly formatted object that can be printed on the console
+    using the 'rich' library
     Args:
-        cli_tree: The treelib Tree object
+        node_sequence: The nodes of the CLI in depth first order
         return_obj: If required, we can avoid printing the object and simply return it
             as a python reference
 
@@ -166,32 +152,108 @@ def build_rich_tree(cli_tree: treelib.Tree, return_obj: bool = False) -> Optiona
         (Optional) object that can be printed in the rich console
 
     """
-    if cli_tree.nodes:
-
-        # Format and create the root node
-        root_text = Panel.fit(f"{cli_tree.root} tree {ICONS.get('tree')}")
-        root_renderable = root_text
-        rich_tree = RichTree(label=root_renderable, highlight=True)
-
-        # Initialise the lookup object pre-recursion
-        renderable_lookup = {str(root_text): cli_tree.root}
-
-        # Create each node in the treelib Tree structure in the rich_tree object
-        for node in cli_tree.nodes:
-            # Get node object with metadata
-            working_node = cli_tree.nodes[node]
-            _find_or_create_node(
-                parent_node_id=working_node.predecessor(cli_tree.identifier),
-                new_node_id=working_node.identifier,
-                cli_tree=cli_tree,
-                rich_tree=rich_tree,
-                renderable_lookup=renderable_lookup,
-            )
+    (rich_tree,) = visit(node_sequence, [RichExporter()])
+
+    # Return object if requested
+    if return_obj:
+        return rich_tree
+
+    # Print to the console
+    Console().print(rich_tree)
+    return None
+
+
+class _Branch:  # pylint:disable=too-few-public-methods
+    """
+    This class renders a part of the tree of the CLI, e.g. the tree of a top level
+    command, prefixed with the guide lines the tree of the whole CLI would draw for it
+    """
+
+    def __init__(self, renderable: ConsoleRenderable, depth: int, last: bool = False):
+        self.renderable = renderable
+        self.depth = depth
+        self.last = last
+
+    def _guides(self, options: ConsoleOptions) -> Tuple[str, str]:
+        """Returns the guides prefixing the first line and any further lines"""
+        if not self.depth:
+            return "", ""
+        if options.ascii_only:
+            return ("`-- ", "    ") if self.last else ("+-- ", "|   ")
+        return ("└── ", "    ") if self.last else ("├── ", "│   ")
+
+    def __rich_console__(self, console: Console, options: ConsoleOptions) -> RenderResult:
+        first_guide, guide = self._guides(options)
+        guide_style = console.get_style("tree.line", default="") or Style.null()
+        background_style = console.get_style("tree").background_style
+        # As in rich, the guides don't embolden or underline what follows them
+        post_style = Style(bold=False, underline2=False)
+
+        lines = console.render_lines(
+            self.renderable,
+            options.update(width=options.max_width - len(guide), height=None, highlight=True),
+        )
+        for position, line in enumerate(lines):
+            if self.depth:
+                prefix = Segment(guide if position else first_guide, guide_style)
+                yield from Segment.apply_style([prefix], background_style, post_style=post_style)
+            yield from line
+            yield Segment.line()
 
-        # Return object if requested
-        if return_obj:
-            return rich_tree
 
-        # Print to the console
-        Console().print(rich_tree)
-        return None
+def iter_rich_trees(node_sequence: Iterable[ClickNode]) -> Iterator[ConsoleRenderable]:
+    """
+    This method converts the CLI to rich renderables one top level command at a
+    time, so that each can be printed as soon as it is built and then discarded.
+    Printed one after another, they look the same as the tree of the whole CLI.
+    Args:
+        node_sequence: The nodes of the CLI in depth first order
+
+    Returns:
+        An iterator of the root panel followed by a branch per top level command
+    """
+    yield _Branch(Styled(_root_renderable(), "tree"), depth=0)
+
+    # A command is complete, and known not to be the last one, once the next one
+    # starts. The parameter tables are only shared within a command, so that memory
+    # does not grow with the size of the CLI.
+    cache: Optional[_RenderableCache] = None
+    # The rich tree handles of the current top level command and its open descendants
+    handles: List[RichTree] = []
+    for node in node_sequence:
+        depth = len(node.route) - 1
+        if depth == 0:
+            if handles:
+                yield _Branch(handles[0], depth=1)
+            cache = _RenderableCache()
+            rich_renderable = _make_rich_renderable(node_data=node, cache=cache)
+            handles = [RichTree(label=rich_renderable, highlight=True)]
+            continue
+        rich_renderable = _make_rich_renderable(node_data=node, cache=cache)
+        del handles[depth:]
+        handles.append(handles[-1].add(rich_renderable, highlight=False))
+
+    if handles:
+        yield _Branch(handles[0], depth=1, last=True)
+
+
+def print_rich_trees(
+    node_sequence: Iterable[ClickNode], console: Optional[Console] = None, pager: bool = False
+):
+    """
+    This method prints the CLI one top level command at a time, see iter_rich_trees.
+    Output starts as soon as the first command is built, and only one command's
+    renderables are held in memory at once.
+    Args:
+        node_sequence: The nodes of the CLI in depth first order
+        console: If provided, the console to print to, otherwise a new one is created
+        pager: If true, the output is shown in the system pager (e.g. less). rich
+            hands the pager the complete rendered text, so it opens once every
+            command is rendered, although only that text is held in memory
+    """
+    console = console or Console()
+    with ExitStack() as stack:
+        if pager:
+            stack.enter_context(console.pager(styles=True))
+        for rich_renderable in iter_rich_trees(node_sequence):
+            console.print(rich_renderable)
@@ -0,0 +1,112 @@
+"""
+This module provides an immutable snapshot of an extracted CLI, which can be shared
+between threads and cheaply sent to other processes
+"""
+
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from click_tree_viz.click_utils import ClickNode
+from click_tree_viz.exporters import Exporter, create_exporter, visit
+from click_tree_viz.flat_tree import FlatTree, as_flat_tree
+
+
+class CliSnapshot:
+    """
+    This class holds the nodes of a CLI without any state beyond them: there are no
+    caches or lazily built indexes, and the nodes and their parameters are immutable
+    themselves. It can therefore be read from many threads at once without locking.
+
+    Snapshots of the same CLI are equal and hash alike, so they can key a dictionary.
+    Pickling one only stores its nodes, whose shared parameters are stored once.
+    """
+
+    __slots__ = ("_tree", "_hash")
+
+    _tree: FlatTree
+    _hash: Optional[int]
+
+    def __init__(self, node_sequence: Iterable[ClickNode]):
+        """
+        Args:
+            node_sequence: The nodes of the CLI in depth first order
+        """
+        object.__setattr__(self, "_tree", as_flat_tree(node_sequence))
+        object.__setattr__(self, "_hash", None)
+
+    @property
+    def nodes(self) -> Tuple[ClickNode, ...]:
+        """The nodes of the CLI in depth first order"""
+        return self._tree[:]
+
+    def __len__(self) -> int:
+        return len(self._tree)
+
+    def __iter__(self) -> Iterator[ClickNode]:
+        return iter(self._tree)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, CliSnapshot):
+            return NotImplemented
+        return self is other or (hash(self) == hash(other) and self.nodes == other.nodes)
+
+    def __hash__(self) -> int:
+        if self._hash is None:
+            # Racing threads compute the same value, so whichever is stored is fine
+            object.__setattr__(self, "_hash", hash(self.nodes))
+        return self._hash
+
+    def __setattr__(self, key: str, value: Any):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        return CliSnapshot, (self.nodes,)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(<{len(self)} nodes>)"
+
+    def get(self, path: str) -> Optional[ClickNode]:
+        """
+        Args:
+            path: The dot separated route to a command, e.g. 'ship.move'
+
+        Returns:
+            The node of the command, or None if there is no such command
+        """
+        position = self._tree.find(path)
+        return None if position is None or position < 0 else self._tree[position]
+
+    def render_many(
+        self,
+        exporters: Sequence[Union[str, Exporter]],
+        root: Optional[str] = None,
+        max_depth: Optional[int] = None,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None,
+    ) -> List[Any]:
+        """
+        Renders the CLI in several formats from a single traversal, identically to
+        ClickTreeViz.render_many. Each call uses exporters of its own, so concurrent
+        calls don't interfere.
+        Args:
+            exporters: The registered names of the formats (see register_exporter), or
+                configured Exporter objects which no other thread is using
+            root: If provided, only the subtree of this command (e.g. 'ship.move') and
+                the groups leading to it are rendered
+            max_depth: If provided, commands nested deeper than this below the root are
+                left out
+            include: If provided, glob patterns of the commands to render (with their
+                subtrees), e.g. 'ship.*'
+            exclude: If provided, glob patterns of the commands to leave out (with their
+                subtrees)
+
+        Returns:
+            The output of each format, in the same order
+
+        Raises:
+            ValueError: If a name is not a registered format
+        """
+        exporters = [create_exporter(x) if isinstance(x, str) else x for x in exporters]
+        tree = self._tree
+        if root is not None or max_depth is not None or include or exclude:
+            tree = tree.select(root=root, max_depth=max_depth, include=include, exclude=exclude)
+        return visit(tree, exporters)
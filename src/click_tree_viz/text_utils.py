@@ -0,0 +1,144 @@
+"""
+This module provides the plain text rendering of a Click CLI, including a leaf for
+each parameter, as an indented tree of box drawing characters
+"""
+
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from click_tree_viz.click_utils import ROOT_ID, ClickNode
+from click_tree_viz.exporters import Exporter
+from click_tree_viz.flat_tree import ROOT, FlatTree, as_flat_tree, param_id, param_label
+
+# Vertical line, branch and last branch of each style, named as treelib names them
+LINE_TYPES = {
+    "ascii": ("|", "|-- ", "+-- "),
+    "ascii-ex": ("│", "├── ", "└── "),
+    "ascii-exr": ("│", "├── ", "╰── "),
+    "ascii-em": ("║", "╠══ ", "╚══ "),
+    "ascii-emv": ("║", "╟── ", "╙── "),
+    "ascii-emh": ("│", "╞══ ", "╘══ "),
+}
+
+# The tag, the label and, for commands, the position of an entry in the tree
+_Entry = Tuple[str, str, Optional[int]]
+
+
+def _label(tag: str, identifier: str, idhidden: bool) -> str:
+    return tag if idhidden else f"{tag}[{identifier}]"
+
+
+def _entries(tree: FlatTree, position: int, reverse: bool, idhidden: bool) -> List[_Entry]:
+    """Lists the commands and parameters directly below a node, sorted by their tag"""
+    entries = [
+        (tree[x].name, _label(tree[x].name, tree[x].path, idhidden), x)
+        for x in tree.children(position)
+    ]
+    if position != ROOT:
+        node = tree[position]
+        for param in node.params:
+            tag = param_label(param)
+            entries.append((tag, _label(tag, param_id(node, param), idhidden), None))
+    entries.sort(key=lambda x: x[0], reverse=reverse)
+    return entries
+
+
+def _iter_branches(
+    tree: FlatTree, start: int, line_chars: Tuple[str, str, str], reverse: bool, idhidden: bool
+) -> Iterator[str]:
+    """Renders the lines below the start node, each prefixed with its branches"""
+    vertical, branch, last_branch = line_chars
+
+    # Each frame holds the entries of a node and how many were rendered, while
+    # leading holds the continuation drawn for each frame below the first
+    leading: List[str] = []
+    stack = [[_entries(tree, start, reverse, idhidden), 0]]
+    while stack:
+        entries, rendered = stack[-1]
+        if rendered == len(entries):
+            stack.pop()
+            if stack:
+                leading.pop()
+            continue
+
+        stack[-1][1] += 1
+        _, label, position = entries[rendered]
+        is_last = rendered == len(entries) - 1
+        yield "".join(leading) + (last_branch if is_last else branch) + label
+
+        if position is not None:
+            leading.append(" " * 4 if is_last else vertical + " " * 3)
+            stack.append([_entries(tree, position, reverse, idhidden), 0])
+
+
+def iter_text_lines(
+    node_sequence: Iterable[ClickNode],
+    nid: Optional[str] = None,
+    idhidden: bool = True,
+    reverse: bool = False,
+    line_type: str = "ascii-ex",
+) -> Iterator[str]:
+    """
+    This method renders the CLI line by line, identically to treelib's show() of
+    the tree with a leaf per parameter: siblings, commands and parameters alike, are
+    sorted by their tag.
+    Args:
+        node_sequence: The nodes of the CLI in depth first order
+        nid: If provided, the path of the command to start from rather than the root
+        idhidden: If false, each identifier is shown in brackets after its tag
+        reverse: If siblings should be in descending order
+        line_type: The style of the lines, see LINE_TYPES
+
+    Returns:
+        An iterator of lines, without line endings
+
+    Raises:
+        KeyError: If there is no command at the path
+    """
+    tree = as_flat_tree(node_sequence)
+    start = ROOT if nid is None else tree.find(nid)
+    if start is None:
+        raise KeyError(nid)
+    if start == ROOT:
+        yield _label(ROOT_ID, ROOT_ID, idhidden)
+    else:
+        yield _label(tree[start].name, tree[start].path, idhidden)
+    yield from _iter_branches(tree, start, LINE_TYPES[line_type], reverse, idhidden)
+
+
+def render_text(node_sequence: Iterable[ClickNode], **kwargs) -> str:
+    """
+    This method renders the CLI as text, each line ending with a newline
+    Args:
+        node_sequence: The nodes of the CLI in depth first order
+        **kwargs: The options of iter_text_lines
+
+    Returns:
+        The rendered tree
+    """
+    return "".join(line + "\n" for line in iter_text_lines(node_sequence, **kwargs))
+
+
+class TextExporter(Exporter):
+    """
+    This class renders the CLI as text, see iter_text_lines. Siblings are sorted
+    together with the parameters of their parent, so the text is laid out from the
+    whole tree.
+    """
+
+    whole_tree = True
+
+    def __init__(self, idhidden: bool = True, reverse: bool = False, line_type: str = "ascii-ex"):
+        """
+        Args:
+            idhidden: If false, each identifier is shown in brackets after its tag
+            reverse: If siblings should be in descending order
+            line_type: The style of the lines, see LINE_TYPES
+        """
+        self.idhidden = idhidden
+        self.reverse = reverse
+        self.line_type = line_type
+
+    def render(self, tree: FlatTree) -> str:
+        return render_text(
+            tree, idhidden=self.idhidden, reverse=self.reverse, line_type=self.line_type
+        )
@@ -0,0 +1,57 @@
+"""
+This module tests the asynchronous construction and rendering of the tree
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from click_tree_viz import ClickTreeViz
+from .examples.naval import naval
+
+
+def _run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+async def _collect(chunks):
+    return [x async for x in chunks]
+
+
+def test_abuild_and_render():
+    async def _render():
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            tree = await ClickTreeViz.abuild(naval.cli, executor=executor)
+            return tree, await tree.arender_many(["json", "text"], root="mine")
+
+    tree, (json_str, text) = _run(_render())
+    assert tree.to_dict() == ClickTreeViz(naval.cli).to_dict()
+    assert json_str == tree.to_json(root="mine")
+    assert text == tree.print(stdout=False, root="mine")
+
+
+@pytest.mark.parametrize(
+    "output_format,options,expected",
+    [
+        ("json", {"reverse": True}, lambda x: x.to_json(reverse=True)),
+        ("text", {"line_type": "ascii"}, lambda x: x.print(stdout=False, line_type="ascii")),
+    ],
+)
+def test_astream(output_format, options, expected):
+    tree = ClickTreeViz(naval.cli)
+    chunks = _run(_collect(tree.astream(output_format, batch_size=2, **options)))
+    assert len(chunks) > 1
+    assert "".join(chunks) == expected(tree)
+
+
+def test_astream_ndjson():
+    tree = ClickTreeViz(naval.cli)
+    chunks = _run(_collect(tree.astream("ndjson", batch_size=3, include=["ship.*"])))
+    assert [len(x.splitlines()) for x in chunks] == [3, 1]
+
+    with pytest.raises(ValueError, match="dot"):
+        _run(_collect(tree.astream("dot")))
@@ -0,0 +1,76 @@
+"""
+This module tests the binary file format of extracted trees
+"""
+import io
+
+import click
+import pytest
+
+from click_tree_viz import ClickTreeViz
+from click_tree_viz.binary_utils import BinaryTree, write_binary
+from click_tree_viz.click_utils import ClickNode, recurse_click_cli
+from .examples.naval import naval
+from .examples.termui import termui
+
+
+def _encode(nodes) -> bytes:
+    stream = io.BytesIO()
+    write_binary(nodes, stream)
+    return stream.getvalue()
+
+
+@pytest.mark.parametrize("cli", [naval.cli, termui.cli, click.Group("empty")])
+def test_round_trip(cli):
+    nodes = recurse_click_cli(cli)
+    binary_tree = BinaryTree(_encode(nodes))
+
+    assert list(binary_tree) == nodes
+    assert [binary_tree[x] for x in range(len(nodes))] == nodes
+    assert binary_tree[-1:] == nodes[-1:]
+    for node in nodes:
+        assert binary_tree.get(node.path) == node
+
+
+def test_lookup():
+    nodes = [
+        ClickNode(name="a", route=["a"], params=[], is_group=True),
+        ClickNode(name="b.c", route=["a", "b.c"], params=[], is_group=False, help="Dotted"),
+        ClickNode(name="ä", route=["ä"], params=naval.cli.commands["ship"].params, is_group=False),
+    ]
+    binary_tree = BinaryTree(_encode(nodes))
+    assert binary_tree.find("a.b.c") == 1
+    assert binary_tree.get("ä") == nodes[2]
+    assert binary_tree.get("a.b") is None and binary_tree.get("CLI") is None
+
+    with pytest.raises(ValueError):
+        BinaryTree(b"CTVB" + bytes(32))
+    with pytest.raises(ValueError):
+        _encode(nodes[1:])
+
+
+def test_truncated():
+    encoded = _encode(recurse_click_cli(naval.cli))
+    assert len(BinaryTree(encoded + b"\0")) == len(BinaryTree(encoded))
+
+    for size in (len(encoded) - 1, len(encoded) // 2, 40):
+        with pytest.raises(ValueError, match="Truncated"):
+            BinaryTree(encoded[:size])
+
+
+def test_file_round_trip(tmp_path):
+    path = str(tmp_path / "naval.ctvb")
+    tree = ClickTreeViz(naval.cli)
+    with open(path, "wb") as file_obj:
+        tree.write_binary(file_obj)
+
+    with BinaryTree.open(path) as binary_tree:
+        assert binary_tree.get("mine.set") == tree.index.get("mine.set")
+
+    loaded = ClickTreeViz.from_binary(path)
+    assert loaded.to_json() == tree.to_json()
+    assert loaded.print(stdout=False) == tree.print(stdout=False)
+
+    with open(path, "r+b") as file_obj:
+        file_obj.truncate(100)
+    with pytest.raises(ValueError, match="Truncated"):
+        BinaryTree.open(path)
@@ -0,0 +1,146 @@
+"""
+This module tests the on-disk cache of extracted CLI trees
+"""
+import os
+import sys
+
+import pytest
+
+from click_tree_viz import ClickTreeViz
+from click_tree_viz import cli_tree
+from click_tree_viz.cache import TreeCache
+from click_tree_viz.click_utils import recurse_click_cli
+from .examples.naval import naval
+
+CLI_SOURCE = '''
+import click
+
+
+@click.group()
+def cli():
+    """Root."""
+
+
+@cli.command()
+@click.option("--dry-run", is_flag=True, help="{help}")
+def deploy(dry_run):
+    """Deploys."""
+'''
+
+
+@pytest.fixture
+def cli_package(tmp_path, monkeypatch):
+    package_dir = tmp_path / "cached_cli"
+    package_dir.mkdir()
+    (package_dir / "__init__.py").write_text("")
+    (package_dir / "main.py").write_text(CLI_SOURCE.format(help="Only pretend."))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield package_dir
+    for module_name in ["cached_cli", "cached_cli.main"]:
+        sys.modules.pop(module_name, None)
+
+
+def test_cache_round_trip(tmp_path):
+    cache = TreeCache(directory=str(tmp_path / "cache"))
+    nodes = recurse_click_cli(naval.cli)
+    assert cache.get("missing") is None
+
+    cache.put("naval", nodes)
+    assert cache.get("naval") == nodes
+
+    cache.clear()
+    assert cache.get("naval") is None
+
+
+def test_cache_hit_skips_traversal(tmp_path, cli_package, monkeypatch):
+    cache = TreeCache(directory=str(tmp_path / "cache"))
+    import_path = "cached_cli.main:cli"
+
+    built = ClickTreeViz.from_import_path(import_path, cache=cache)
+    assert len(os.listdir(cache.directory)) == 1
+
+    def _fail(*_, **__):
+        raise AssertionError("The cached tree should have been used")
+
+    monkeypatch.setattr(cli_tree, "discover_click_cli", _fail)
+    loaded = ClickTreeViz.from_import_path(import_path, cache=cache)
+    assert loaded.to_json() == built.to_json()
+    assert loaded._raw_struct is None
+
+
+def test_cache_fingerprint_tracks_source(tmp_path, cli_package):
+    cache = TreeCache(directory=str(tmp_path / "cache"))
+    import_path = "cached_cli.main:cli"
+    before = cache.fingerprint(import_path)
+    assert cache.fingerprint(import_path) == before
+    assert cache.fingerprint(import_path, max_depth=1) != before
+
+    (cli_package / "main.py").write_text(CLI_SOURCE.format(help="Changed."))
+    assert cache.fingerprint(import_path) != before
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    nodes = recurse_click_cli(naval.cli)
+    cache = TreeCache(directory=str(tmp_path / "cache"))
+    cache.put("first", nodes)
+    entry_size = os.path.getsize(os.path.join(cache.directory, "first.json"))
+
+    cache.max_bytes = 2 * entry_size
+    cache.put("second", nodes)
+    os.utime(os.path.join(cache.directory, "first.json"), (0, 0))
+    cache.put("third", nodes)
+
+    assert cache.get("first") is None
+    assert cache.get("second") == nodes
+    assert cache.get("third") == nodes
+
+
+def test_cache_tracks_modules_outside_the_package(tmp_path, monkeypatch):
+    # A single file CLI taking its help from a sibling module, and a plugin package
+    (tmp_path / "single_cli.py").write_text(
+        "import click\nimport single_helpers\nimport single_plugin\n\n"
+        "cli = click.Group('cli', help=single_helpers.HELP)\n"
+    )
+    (tmp_path / "single_helpers.py").write_text("HELP = 'Root.'\n")
+    (tmp_path / "single_plugin").mkdir()
+    (tmp_path / "single_plugin" / "__init__.py").write_text("")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    cache = TreeCache(directory=str(tmp_path / "cache"))
+
+    def _build():
+        for module_name in ["single_cli", "single_helpers", "single_plugin"]:
+            sys.modules.pop(module_name, None)
+        extra_paths = [str(tmp_path / "single_plugin")]
+        return ClickTreeViz.from_import_path("single_cli:cli", cache=cache, extra_paths=extra_paths)
+
+    assert _build()._raw_struct is not None
+    assert _build()._raw_struct is None
+
+    (tmp_path / "single_helpers.py").write_text("HELP = 'Changed root.'\n")
+    assert _build()._raw_struct is not None
+    assert _build()._raw_struct is None
+
+    (tmp_path / "single_plugin" / "__init__.py").write_text("# Changed\n")
+    assert _build()._raw_struct is not None
+
+
+def test_cache_shared_between_processes(tmp_path, monkeypatch):
+    nodes = recurse_click_cli(naval.cli)
+    cache = TreeCache(directory=str(tmp_path / "cache"))
+    cache.put("first", nodes)
+    cache.put("second", nodes)
+
+    # Another process evicts an entry while this one is reading or scanning it
+    def _evicted(*_, **__):
+        raise FileNotFoundError()
+
+    with monkeypatch.context() as patch:
+        patch.setattr(os, "utime", _evicted)
+        assert cache.get("first") == nodes
+
+    stale_entries = list(os.scandir(cache.directory))
+    os.remove(os.path.join(cache.directory, "first.json"))
+    monkeypatch.setattr(os, "scandir", lambda _: iter(stale_entries))
+    cache.max_bytes = 0
+    cache.put("third", nodes)
+    cache.clear()
@@ -1,9 +1,25 @@
 """
 This module tests the click tree visualisation
 """
+import io
 import json
+import pickle
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+
+import click
+import pytest
 
 from click_tree_viz import ClickTreeViz
+from click_tree_viz.click_utils import (
+    ClickNode,
+    discover_click_cli,
+    iter_click_nodes,
+    iter_click_subtree,
+    recurse_click_cli,
+)
 from .examples.naval import naval
 from .examples.termui import termui
 
@@ -38,6 +54,83 @@ def test_naval_rich_tree():
     )
 
 
+def test_naval_rich_tree_nesting():
+    rich_obj = ClickTreeViz(naval.cli).rich_print(return_object=True)
+
+    def _title(rich_tree):
+        return rich_tree.label.renderable.renderables[0].plain
+
+    assert [_title(x) for x in rich_obj.children] == ["📂 ship", "📂 mine"]
+    ship, mine = rich_obj.children
+    assert [x.label.title for x in ship.children] == ["⚙️ new", "⚙️ move", "⚙️ shoot"]
+    assert [x.label.title for x in mine.children] == ["⚙️ set", "⚙️ remove"]
+    assert all(not x.children for x in ship.children + mine.children)
+
+
+def test_rich_tree_shares_param_tables():
+    verbose = click.Option(["--verbose"], is_flag=True, help="Chatty.")
+    cli = click.Group("cli")
+    for name in ["a", "b"]:
+        cli.add_command(click.Command(name, params=[verbose, click.Option(["--config"])]))
+    cli.add_command(click.Command("c", params=[verbose]))
+
+    a, b, c = ClickTreeViz(cli).rich_print(return_object=True).children
+    tables = [x.label.renderable.renderables[-1] for x in (a, b, c)]
+    assert tables[0] is tables[1]
+    assert tables[2] is not tables[0]
+    # Rows of identical parameters are shared too
+    assert tables[2].columns[1]._cells[0] is tables[0].columns[1]._cells[0]
+    # Commands and parameters without help render as empty descriptions
+    assert tables[0].columns[1]._cells[1].plain == ""
+
+
+@pytest.mark.parametrize("cli", [naval.cli, termui.cli])
+@pytest.mark.parametrize("legacy_windows", [False, True])
+def test_chunked_rich_print(cli, legacy_windows, monkeypatch):
+    # pylint:disable=import-outside-toplevel
+    from rich.console import Console
+    from click_tree_viz import rich_utils
+
+    tree = ClickTreeViz(cli)
+    expected, chunked = io.StringIO(), io.StringIO()
+    Console(file=expected, width=80, force_terminal=True, legacy_windows=legacy_windows).print(
+        tree.rich_print(return_object=True)
+    )
+
+    # Each top level command is built with its own tables, which are released with it
+    caches = []
+    cache_class = rich_utils._RenderableCache  # pylint:disable=protected-access
+    monkeypatch.setattr(
+        rich_utils, "_RenderableCache", lambda: caches.append(cache_class()) or caches[-1]
+    )
+    rich_utils.print_rich_trees(
+        tree.snapshot(),
+        console=Console(file=chunked, width=80, force_terminal=True, legacy_windows=legacy_windows),
+    )
+    assert chunked.getvalue() == expected.getvalue()
+    assert len(caches) == len(tree.rich_print(return_object=True).children)
+
+
+def test_chunked_rich_print_is_streamed():
+    from click_tree_viz.rich_utils import iter_rich_trees  # pylint:disable=import-outside-toplevel
+
+    read = []
+    nodes = ClickTreeViz(naval.cli).snapshot()
+    renderables = iter_rich_trees(x for x in nodes if not read.append(x))
+
+    next(renderables)
+    assert not next(renderables).last
+    # The 'ship' branch is complete as soon as 'mine' is read
+    assert [x.path for x in read] == ["ship", "ship.new", "ship.move", "ship.shoot", "mine"]
+    assert next(renderables).last and len(read) == len(nodes)
+
+
+def test_chunked_rich_print_selects(capsys):
+    ClickTreeViz(naval.cli).rich_print(chunked=True, root="mine")
+    output = capsys.readouterr().out
+    assert "set" in output and "remove" in output and "ship" not in output
+
+
 def test_termui_cli():
     termui_cli = termui.cli
     tree = ClickTreeViz(termui_cli)
@@ -158,3 +251,241 @@ def test_termui_cli():
     assert expected == processed
 
     tree.rich_print()  # prove this works without error
+
+
+def _snapshot_state(cli_obj):
+    """Shallow copy of the attributes of every command and param in the CLI"""
+    state = {id(cli_obj): dict(vars(cli_obj))}
+    for param in cli_obj.params:
+        state[id(param)] = dict(vars(param))
+    for sub_command in getattr(cli_obj, "commands", {}).values():
+        state.update(_snapshot_state(sub_command))
+    return state
+
+
+def test_traversal_is_read_only():
+    calls = []
+
+    @click.group()
+    def cli():
+        """Root"""
+        calls.append("cli")
+
+    @cli.command()
+    @click.option("--count", default=1, callback=lambda *_: calls.append("count"))
+    def run(count):
+        """Runs"""
+        calls.append("run")
+
+    # Objects which cannot be deep copied must not prevent traversal
+    cli.lock = threading.Lock()
+    run.lock = threading.Lock()
+
+    naval_before = _snapshot_state(naval.cli)
+    cli_before = _snapshot_state(cli)
+
+    tree = ClickTreeViz(cli)
+    ClickTreeViz(naval.cli)
+
+    assert tree._raw_struct is cli
+    assert tree.to_dict()["CLI"]["children"][0]["run"]["data"]["help"] == "Runs"
+    assert calls == []
+    assert _snapshot_state(cli) == cli_before
+    assert _snapshot_state(naval.cli) == naval_before
+
+
+def test_iter_click_nodes_streams_depth_first():
+    nodes = iter_click_nodes(naval.cli)
+    assert [x.path for x in islice(nodes, 2)] == ["ship", "ship.new"]
+    assert [x.path for x in nodes] == [
+        "ship.move",
+        "ship.shoot",
+        "mine",
+        "mine.set",
+        "mine.remove",
+    ]
+    assert list(iter_click_nodes(naval.cli)) == recurse_click_cli(naval.cli)
+
+
+def test_iter_click_nodes_beyond_recursion_limit():
+    depth = sys.getrecursionlimit() + 100
+    root = group = click.Group("root")
+    for level in range(depth):
+        sub_group = click.Group(f"level{level}")
+        group.add_command(sub_group)
+        group = sub_group
+
+    nodes = list(iter_click_nodes(root))
+    assert len(nodes) == depth
+    assert nodes[-1].route == tuple(f"level{x}" for x in range(depth))
+
+
+class _LazyPlugins(click.MultiCommand):
+    """A MultiCommand which only loads its plugins through the protocol"""
+
+    def __init__(self, plugins, loaded, **kwargs):
+        super().__init__(**kwargs)
+        self.plugins = plugins
+        self.loaded = loaded
+
+    def list_commands(self, ctx):
+        return sorted(self.plugins)
+
+    def get_command(self, ctx, cmd_name):
+        self.loaded.append(cmd_name)
+        return self.plugins[cmd_name]()
+
+
+def _make_lazy_cli(loaded):
+    def _deploy():
+        return _LazyPlugins(
+            name="deploy",
+            help="Deploys things.",
+            plugins={"app": lambda: click.Command("app", help="Deploys the app.")},
+            loaded=loaded,
+        )
+
+    def _lint():
+        return click.Command("lint", help="Lints.", params=[click.Option(["--fix"])])
+
+    return _LazyPlugins(name="cli", plugins={"deploy": _deploy, "lint": _lint}, loaded=loaded)
+
+
+def test_lazy_multi_command_expansion():
+    loaded = []
+    nodes = iter_click_nodes(_make_lazy_cli(loaded))
+    assert loaded == []
+
+    deploy = next(nodes)
+    assert (deploy.path, deploy.is_group, deploy.help) == ("deploy", True, "Deploys things.")
+    assert loaded == ["deploy"]
+
+    assert [x.path for x in nodes] == ["deploy.app", "lint"]
+    assert loaded == ["deploy", "app", "lint"]
+
+
+def test_lazy_multi_command_max_depth():
+    loaded = []
+    tree = ClickTreeViz(_make_lazy_cli(loaded), max_depth=1)
+    assert loaded == ["deploy", "lint"]
+    assert [list(x.keys())[0] for x in tree.to_dict()["CLI"]["children"]] == ["deploy", "lint"]
+
+    assert [x.path for x in iter_click_nodes(naval.cli, max_depth=1)] == ["ship", "mine"]
+    assert list(iter_click_nodes(naval.cli, current_path=["cli"], max_depth=1)) == []
+
+
+def test_lazy_multi_command_root():
+    loaded = []
+    tree = ClickTreeViz(_make_lazy_cli(loaded), root="deploy.app")
+    assert loaded == ["deploy", "app"]
+    assert [x.path for x in tree.snapshot()] == ["deploy", "deploy.app"]
+
+    full_tree = ClickTreeViz(naval.cli)
+    for root in ("ship", "mine", "mine.set", "ship.move"):
+        for max_depth in (None, 0, 1, 2):
+            tree = ClickTreeViz(naval.cli, root=root, max_depth=max_depth)
+            assert tree.to_json() == full_tree.to_json(root=root, max_depth=max_depth)
+
+    assert [x.path for x in iter_click_subtree(naval.cli, "ship", max_depth=0)] == ["ship"]
+    for root in ("sink", "ship.sink", "ship.move.x"):
+        with pytest.raises(KeyError):
+            ClickTreeViz(naval.cli, root=root)
+
+
+def test_discover_click_cli_matches_serial_traversal():
+    import_path = "tests.examples.naval.naval:cli"
+    expected = recurse_click_cli(naval.cli)
+
+    assert discover_click_cli(import_path) == expected
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert discover_click_cli(import_path, executor=executor) == expected
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        assert discover_click_cli(import_path, executor=executor) == expected
+        tree = ClickTreeViz.from_import_path(import_path, executor=executor)
+    assert tree.to_json() == ClickTreeViz(naval.cli).to_json()
+
+    assert discover_click_cli(import_path, max_depth=1) == recurse_click_cli(naval.cli, max_depth=1)
+
+
+def test_click_nodes_are_compact_and_shared():
+    @click.group()
+    def cli():
+        """Root"""
+
+    for name in ["first", "second"]:
+        cli.command(name)(click.option("--verbose", is_flag=True, help="Chatty.")(lambda: None))
+
+    first, second = recurse_click_cli(cli)
+    assert not hasattr(first, "__dict__")
+    assert first.params[0] is second.params[0]
+    assert first.params[0]["opts"] == ("--verbose",)
+    assert first.params[0].get("help") == "Chatty."
+    assert first.as_dict()["params"] == [
+        {"type": "option", "name": "verbose", "opts": ["--verbose"], "help": "Chatty."}
+    ]
+
+    with pytest.raises(AttributeError):
+        first.name = "third"
+
+    naval_nodes = recurse_click_cli(naval.cli)
+    assert pickle.loads(pickle.dumps(naval_nodes)) == naval_nodes
+    assert [ClickNode(**x.as_dict()) for x in naval_nodes] == naval_nodes
+    assert naval_nodes[1].path == "ship.new"
+    assert naval_nodes[1].parent_path == "ship"
+
+
+def test_to_treelib_on_demand():
+    tree = ClickTreeViz(naval.cli)
+    commands, with_params = tree.to_treelib(), tree.to_treelib(params=True)
+
+    assert all(with_params[x].data is commands[x].data for x in commands.nodes)
+    assert len(commands) == 8
+    assert len(with_params) == 8 + 14
+    assert [x.tag for x in commands.children("mine.set")] == []
+    assert [x.tag for x in with_params.children("mine.set")] == [
+        "[argument] x",
+        "[argument] y",
+        "[option] --moored",
+        "[option] --drifting",
+    ]
+
+
+def test_exporters_are_memoized_per_arguments():
+    tree = ClickTreeViz(naval.cli)
+
+    default_graph = tree.to_graphviz()
+    assert tree.to_graphviz(shape="plain", layout_dir="LR") is default_graph
+    top_down = tree.to_graphviz(layout_dir="TB")
+    assert 'rankdir="TB"' in top_down and 'rankdir="LR"' not in top_down
+    assert "shape=box" in tree.to_graphviz(shape="box")
+
+    assert tree.to_json() is tree.to_json()
+    assert tree.print(stdout=False) is tree.print(stdout=False)
+
+    tree.clear_export_cache()
+    assert tree.to_graphviz() is not default_graph
+    assert tree.to_graphviz() == default_graph
+
+
+def test_mutable_exports_are_not_shared():
+    tree = ClickTreeViz(naval.cli)
+
+    tree_dict = tree.to_dict()
+    assert tree.to_dict(sort=True) == tree_dict
+    tree_dict["CLI"]["children"].clear()
+    tree.to_dict()["CLI"]["children"][0]["mine"]["data"]["params"].clear()
+    assert tree.to_dict() == ClickTreeViz(naval.cli).to_dict()
+
+    rich_obj = tree.rich_print(return_object=True)
+    rich_obj.add("extra")
+    assert len(tree.rich_print(return_object=True).children) == len(rich_obj.children) - 1
+
+
+def test_export_cache_is_bounded():
+    tree = ClickTreeViz(naval.cli)
+    tree._export_cache.max_size = 2
+    first = tree.to_graphviz(layout_dir="TB")
+    tree.to_graphviz(layout_dir="BT")
+    tree.to_graphviz(layout_dir="RL")
+    assert len(tree._export_cache) == 2
+    assert tree.to_graphviz(layout_dir="TB") is not first
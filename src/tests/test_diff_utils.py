@@ -0,0 +1,118 @@
+"""
+This module tests the comparison of two versions of a CLI
+"""
+import click
+
+from click_tree_viz import ClickTreeViz
+from click_tree_viz.diff_utils import DiffRecord, diff_trees
+from click_tree_viz.query import CliIndex
+from .examples.naval import naval
+
+
+def _make_cli(version):
+    @click.group()
+    def cli():
+        """Root"""
+
+    @cli.group()
+    def ship():
+        """Manages ships."""
+
+    @ship.command()
+    @click.argument("name")
+    def new(name):
+        """Creates a new ship."""
+
+    @ship.command()
+    @click.option("--speed", help="Speed in knots." if version == 1 else "Speed in km/h.")
+    @click.option("--dry-run", is_flag=True)
+    def move(speed, dry_run):
+        """Moves a ship."""
+
+    @cli.group()
+    def mine():
+        """Manages mines."""
+
+    for name in ["set", "remove"]:
+        mine.command(name)(click.argument("x")(lambda x: None))
+
+    if version == 1:
+
+        @cli.command()
+        def legacy():
+            """Going away."""
+
+    else:
+
+        @ship.command()
+        @click.option("--target", "-t")
+        def shoot(target):
+            """Fires."""
+
+        move.params = [x for x in move.params if x.name != "dry_run"]
+
+    return cli
+
+
+class _RecordingIndex(CliIndex):
+    """Records which groups had their children compared"""
+
+    def __init__(self, node_sequence):
+        super().__init__(node_sequence)
+        self.visited = []
+
+    def children(self, path=None):
+        self.visited.append(path)
+        return super().children(path)
+
+
+def test_identical_trees_have_no_diff():
+    assert ClickTreeViz(naval.cli).diff(ClickTreeViz(naval.cli)) == []
+
+
+def test_diff_reports_structured_records():
+    before, after = ClickTreeViz(_make_cli(1)), ClickTreeViz(_make_cli(2))
+    assert before.diff(after) == [
+        DiffRecord(change="removed", kind="command", path="legacy"),
+        DiffRecord(
+            change="changed",
+            kind="option",
+            path="ship.move",
+            param="speed",
+            attribute="help",
+            before="Speed in knots.",
+            after="Speed in km/h.",
+        ),
+        DiffRecord(change="removed", kind="option", path="ship.move", param="dry_run"),
+        DiffRecord(change="added", kind="command", path="ship.shoot"),
+    ]
+    assert [x.change for x in after.diff(before)] == ["added", "removed", "changed", "added"]
+
+
+def test_diff_skips_identical_subtrees():
+    before, after = ClickTreeViz(_make_cli(1)), ClickTreeViz(_make_cli(2))
+    before_index = _RecordingIndex(before._tree)
+    after_index = _RecordingIndex(after._tree)
+
+    diff_trees(before_index, before._subtree_digests(), after_index, after._subtree_digests())
+
+    # The unchanged 'mine' group and the leaf commands are never descended into
+    assert before_index.visited == after_index.visited == [None, "ship"]
+
+
+def test_diff_tells_apart_params_sharing_a_name():
+    def _make_cli(with_moored):
+        @click.command(name="set")
+        @click.option("ty", "--moored", flag_value="moored", default=True)
+        @click.option("ty", "--drifting", flag_value="drifting")
+        def set_command(ty):
+            """Sets a mine."""
+
+        if not with_moored:
+            set_command.params = [x for x in set_command.params if "--moored" not in x.opts]
+        return click.Group("cli", commands={"set": set_command})
+
+    before, after = ClickTreeViz(_make_cli(True)), ClickTreeViz(_make_cli(False))
+    assert before.diff(after) == [
+        DiffRecord(change="removed", kind="option", path="set", param="--moored")
+    ]
@@ -0,0 +1,79 @@
+"""
+This module tests the graphviz dot language writer
+"""
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+
+from click_tree_viz import ClickTreeViz
+from click_tree_viz.click_utils import recurse_click_cli
+from click_tree_viz.dot_utils import write_dot
+from .examples.naval import naval
+
+
+def test_write_dot_streams_to_file_obj():
+    stream = io.StringIO()
+    write_dot(recurse_click_cli(naval.cli), stream, layout_dir="TB")
+    output = stream.getvalue()
+
+    assert output == ClickTreeViz(naval.cli).to_graphviz(layout_dir="TB")
+    assert output.startswith('digraph tree {\n\trankdir="TB";\n')
+    assert '\t"ship.move.--speed" [label="[option] --speed", shape=plain]\n' in output
+    assert '\t"ship.move" -> "ship.move.--speed"\n' in output
+
+
+def test_write_dot_escapes_labels():
+    @click.group()
+    def cli():
+        """Root"""
+
+    @cli.command('we}ird"name')
+    @click.option("--path", help='Ends with a } and "quotes"')
+    def _command(path):
+        """Help with a } brace"""
+
+    output = ClickTreeViz(cli).to_graphviz()
+    assert '\t"we}ird\\"name" [label="we}ird\\"name", shape=plain]\n' in output
+    assert '\t"CLI" -> "we}ird\\"name"\n' in output
+    assert output.count("rankdir") == 1
+    assert output.endswith("\n}\n")
+
+
+def test_write_dot_shapes_and_clusters():
+    output = ClickTreeViz(naval.cli).to_graphviz(
+        shapes={"group": "folder", "argument": "note", "cli": "box"}, cluster=True
+    )
+    assert '"CLI" [label="CLI", shape=box]' in output
+    assert '"ship" [label="ship", shape=folder]' in output
+    assert '"ship.new" [label="new", shape=plain]' in output
+    assert '"ship.new.name" [label="[argument] name", shape=note]' in output
+    assert '\tsubgraph "cluster_ship" {\n\t\tlabel="ship";\n' in output
+    assert output.count("subgraph") == 2
+    assert output.count("{") == output.count("}") == 3
+    assert output.count("->") == 21
+
+
+def test_write_dot_undirected_graph():
+    tree = ClickTreeViz(naval.cli)
+    output = tree.to_graphviz(graph="graph")
+    assert output.startswith("graph tree {\n")
+    assert '\t"ship.move" -- "ship.move.--speed"\n' in output
+    assert "->" not in output and output.count(" -- ") == 21
+
+    assert tree.to_graphviz(graph="strict digraph").count(" -> ") == 21
+    assert tree.to_graphviz(graph="strict graph").count(" -- ") == 21
+
+
+def test_write_dot_is_thread_safe():
+    nodes = recurse_click_cli(naval.cli)
+    layouts = ["LR", "TB", "RL", "BT"] * 25
+
+    def _render(layout_dir):
+        stream = io.StringIO()
+        write_dot(nodes, stream, layout_dir=layout_dir, cluster=True)
+        return stream.getvalue()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        outputs = list(executor.map(_render, layouts))
+    assert outputs == [_render(x) for x in layouts]
@@ -0,0 +1,87 @@
+"""
+This module tests the exporter registry and the single traversal feeding them
+"""
+import io
+
+import pytest
+
+from click_tree_viz import ClickTreeViz, Exporter, register_exporter
+from click_tree_viz.dot_utils import DotExporter
+from click_tree_viz.exporters import _EXPORTERS, available_exporters
+from click_tree_viz.flat_tree import FlatTree
+from .examples.naval import naval
+from .examples.termui import termui
+
+
+class MarkdownExporter(Exporter):
+    """A third party format, rendering the commands as a nested list"""
+
+    def __init__(self):
+        self.lines = []
+
+    def start(self):
+        self.lines = []
+
+    def enter(self, node):
+        self.lines.append("  " * (len(node.route) - 1) + f"- `{node.name}`")
+
+    def finish(self):
+        return "\n".join(self.lines)
+
+
+@pytest.fixture(name="markdown")
+def fixture_markdown():
+    register_exporter("markdown")(MarkdownExporter)
+    yield
+    del _EXPORTERS["markdown"]
+
+
+@pytest.mark.parametrize("cli", [naval.cli, termui.cli])
+def test_render_many_matches_renderers(cli):
+    tree = ClickTreeViz(cli)
+    json_str, tree_dict, dot, text, rich_tree, ndjson = tree.render_many(
+        ["json", "dict", DotExporter(cluster=True), "text", "rich", "ndjson"]
+    )
+
+    assert json_str == tree.to_json()
+    assert tree_dict == tree.to_dict()
+    assert dot == tree.to_graphviz(cluster=True)
+    assert text == tree.print(stdout=False)
+    assert len(rich_tree.children) == len(tree.rich_print(return_object=True).children)
+    stream = io.StringIO()
+    tree.write_json(stream, ndjson=True)
+    assert ndjson == stream.getvalue()
+
+
+def test_render_many_selects(markdown):  # pylint:disable=unused-argument
+    tree = ClickTreeViz(naval.cli)
+    assert "markdown" in available_exporters()
+
+    markdown_str, text = tree.render_many(["markdown", "text"], root="ship", max_depth=1)
+    assert markdown_str == "- `ship`\n  - `new`\n  - `move`\n  - `shoot`"
+    assert text == tree.print(stdout=False, root="ship", max_depth=1)
+
+
+def test_render_many_shares_the_tree(monkeypatch):
+    tree = ClickTreeViz(naval.cli)
+    built = []
+    monkeypatch.setattr(FlatTree, "__init__", lambda *args: built.append(args))
+
+    class WholeTreeExporter(Exporter):
+        """A format handed the tree rather than fed each command"""
+
+        whole_tree = True
+
+        def render(self, tree):
+            return tree
+
+    json_str, text, flat_tree, dot = tree.render_many(["json", "text", WholeTreeExporter(), "dot"])
+    monkeypatch.undo()
+    assert not built
+    assert (json_str, text, dot) == (tree.to_json(), tree.print(stdout=False), tree.to_graphviz())
+    assert [x.path for x in flat_tree] == [x.path for x in tree.snapshot()]
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError, match="yaml"):
+        ClickTreeViz(naval.cli).render_many(["yaml"])
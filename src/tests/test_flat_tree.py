@@ -0,0 +1,121 @@
+"""
+This module tests the array-backed tree and the exporters walking it
+"""
+import pickle
+
+import click
+import pytest
+
+from click_tree_viz import ClickTreeViz
+from click_tree_viz.click_utils import ClickNode, recurse_click_cli
+from click_tree_viz.flat_tree import ROOT, FlatTree
+from click_tree_viz.text_utils import render_text
+from .examples.naval import naval
+from .examples.termui import termui
+
+
+def test_positions():
+    tree = FlatTree(recurse_click_cli(naval.cli))
+
+    assert [x.path for x in tree] == [
+        "ship",
+        "ship.new",
+        "ship.move",
+        "ship.shoot",
+        "mine",
+        "mine.set",
+        "mine.remove",
+    ]
+    assert list(tree.parents) == [ROOT, 0, 0, 0, ROOT, 4, 4]
+    assert list(tree.children()) == [0, 4]
+    assert list(tree.children(0)) == [1, 2, 3]
+    assert list(tree.children(1)) == []
+    assert tree.find("mine.set") == 5
+    assert tree.find("CLI") == ROOT
+    assert tree.find("mine.nope") is None
+    assert list(pickle.loads(pickle.dumps(tree))) == list(tree)
+
+
+def test_rejects_orphans():
+    with pytest.raises(ValueError):
+        FlatTree([ClickNode(name="new", route=["ship", "new"], params=[], is_group=False)])
+
+
+@pytest.mark.parametrize("cli", [naval.cli, termui.cli, click.Group("empty")])
+def test_matches_treelib(cli):
+    tree = FlatTree(recurse_click_cli(cli))
+    treelib_obj = tree.to_treelib(params=True)
+
+    for kwargs in [{}, {"reverse": True}, {"idhidden": False}, {"line_type": "ascii"}]:
+        assert render_text(tree, **kwargs) == treelib_obj.show(stdout=False, **kwargs)
+
+    viz = ClickTreeViz(cli)
+    for kwargs in [{}, {"reverse": True}, {"sort": False}]:
+        expected = viz.to_dict(key=lambda x: x, **kwargs)
+        assert viz.to_dict(**kwargs) == expected
+
+
+def test_text_from_command():
+    tree = ClickTreeViz(naval.cli)
+    assert tree.print(stdout=False, nid="mine.set") == (
+        "set\n"
+        "├── [argument] x\n"
+        "├── [argument] y\n"
+        "├── [option] --drifting\n"
+        "└── [option] --moored\n"
+    )
+    # Arguments written against treelib nodes are still supported
+    assert tree.print(stdout=False, filter=lambda x: x.tag != "ship") == (
+        "CLI\n"
+        "└── mine\n"
+        "    ├── remove\n"
+        "    │   ├── [argument] x\n"
+        "    │   └── [argument] y\n"
+        "    └── set\n"
+        "        ├── [argument] x\n"
+        "        ├── [argument] y\n"
+        "        ├── [option] --drifting\n"
+        "        └── [option] --moored\n"
+    )
+
+
+@pytest.mark.parametrize(
+    "kwargs,expected",
+    [
+        ({}, ["ship", "ship.new", "ship.move", "ship.shoot", "mine", "mine.set", "mine.remove"]),
+        ({"root": "ship.move"}, ["ship", "ship.move"]),
+        ({"root": "ship", "max_depth": 0}, ["ship"]),
+        ({"max_depth": 1}, ["ship", "mine"]),
+        ({"include": ["*.set"]}, ["mine", "mine.set"]),
+        ({"include": ["ship"], "exclude": ["*.new"]}, ["ship", "ship.move", "ship.shoot"]),
+        ({"root": "mine", "exclude": ["mine.*"]}, ["mine"]),
+    ],
+)
+def test_select(kwargs, expected):
+    tree = FlatTree(recurse_click_cli(naval.cli))
+    assert [x.path for x in tree.select(**kwargs)] == expected
+
+
+def test_select_unknown_root():
+    with pytest.raises(KeyError):
+        FlatTree(recurse_click_cli(naval.cli)).select(root="ship.sink")
+
+
+def test_renderers_select_before_rendering():
+    tree = ClickTreeViz(naval.cli)
+    assert tree.print(stdout=False, root="ship.move", exclude=["*.move.*"]) == (
+        "CLI\n"
+        "└── ship\n"
+        "    └── move\n"
+        "        ├── [argument] ship\n"
+        "        ├── [argument] x\n"
+        "        ├── [argument] y\n"
+        "        └── [option] --speed\n"
+    )
+
+    graph = tree.to_graphviz(include=["mine.*"])
+    assert '"CLI" -> "mine"' in graph and '"ship"' not in graph
+    top_level = tree.to_dict(max_depth=1)["CLI"]["children"]
+    assert [list(x) for x in top_level] == [["mine"], ["ship"]]
+    assert "children" not in top_level[0]["mine"]
+    assert len(tree.rich_print(return_object=True, root="mine.set").children[0].children) == 1
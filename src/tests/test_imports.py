@@ -0,0 +1,46 @@
+"""
+This module tests that the optional renderers' dependencies are imported lazily
+"""
+import json
+import os
+import subprocess
+import sys
+
+# The directory holding both click_tree_viz and the tests package
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY_MODULES = [
+    "rich",
+    "treelib",
+    "asyncio",
+    "click_tree_viz.cache",
+    "click_tree_viz.diff_utils",
+]
+
+
+def _loaded_after(code: str):
+    """Runs the code in a fresh interpreter, listing the lazy modules it imported"""
+    script = (
+        f"import sys\n{code}\n"
+        f"import json\nprint(json.dumps([x for x in {LAZY_MODULES!r} if x in sys.modules]))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script], check=True, stdout=subprocess.PIPE, cwd=SRC_DIR
+    ).stdout
+    return json.loads(output)
+
+
+def test_import_is_lazy():
+    assert _loaded_after("import click_tree_viz") == []
+
+
+def test_exporters_only_import_what_they_need():
+    build = (
+        "from click_tree_viz import ClickTreeViz\n"
+        "from tests.examples.naval import naval\n"
+        "tree = ClickTreeViz(naval.cli)\n"
+    )
+    exporters = "tree.to_json(); tree.to_graphviz(); tree.print(stdout=False)"
+    assert _loaded_after(build + exporters) == []
+    assert _loaded_after(build + "tree.rich_print(return_object=True)") == ["rich"]
+    assert _loaded_after(build + "tree.to_treelib()") == ["treelib"]
@@ -0,0 +1,72 @@
+"""
+This module tests the opt-in per stage instrumentation
+"""
+import io
+
+from click_tree_viz import ClickTreeViz
+from click_tree_viz.instrumentation import NULL_STAGE, Instrumentation
+from .examples.naval import naval
+
+
+def test_stages_recorded():
+    instrumentation = Instrumentation()
+    tree = ClickTreeViz(naval.cli, instrumentation=instrumentation)
+    assert [x.stage for x in instrumentation.stages] == ["traverse", "build_tree"]
+    assert instrumentation.stages[0].nodes == 7
+
+    tree.to_json()
+    tree.to_json()
+    tree.print(stdout=False)
+    assert [x.stage for x in instrumentation.stages][2:] == ["to_json", "show"]
+    assert all(x.seconds >= 0 for x in instrumentation.stages)
+    assert instrumentation.total_seconds() >= instrumentation.total_seconds("to_json")
+
+
+def test_streaming_exporters_recorded():
+    instrumentation = Instrumentation()
+    tree = ClickTreeViz(naval.cli, instrumentation=instrumentation)
+
+    tree.write_json(io.StringIO())
+    tree.write_json(io.StringIO(), ndjson=True, root="mine")
+    tree.write_graphviz(io.StringIO())
+    tree.write_binary(io.BytesIO())
+    assert [(x.stage, x.nodes) for x in instrumentation.stages][2:] == [
+        ("write_json", 7),
+        ("select", 7),
+        ("write_ndjson", 3),
+        ("write_graphviz", 7),
+        ("write_binary", 7),
+    ]
+
+
+def test_callback_and_memory():
+    received = []
+    instrumentation = Instrumentation(callback=received.append, track_memory=True)
+    ClickTreeViz(naval.cli, instrumentation=instrumentation)
+
+    assert received == instrumentation.stages
+    assert all(x.peak_bytes is not None and x.peak_bytes >= 0 for x in received)
+
+
+def test_nested_stages_memory():
+    instrumentation = Instrumentation(track_memory=True)
+    with instrumentation.stage("outer"):
+        allocated = bytearray(10 * 1024 * 1024)
+        del allocated
+        with instrumentation.stage("inner"):
+            pass
+        with instrumentation.stage("inner"):
+            allocated = bytearray(1024 * 1024)
+            del allocated
+
+    inner, second_inner, outer = instrumentation.stages
+    assert outer.stage == "outer" and outer.peak_bytes >= 10 * 1024 * 1024
+    assert inner.peak_bytes < 1024 * 1024 <= second_inner.peak_bytes < 10 * 1024 * 1024
+
+
+def test_disabled_by_default():
+    tree = ClickTreeViz(naval.cli)
+    assert tree.instrumentation is None
+    assert tree._stage("traverse") is NULL_STAGE  # pylint:disable=protected-access
+    with tree._stage("traverse") as stats:  # pylint:disable=protected-access
+        assert stats is None
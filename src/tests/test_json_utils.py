@@ -0,0 +1,58 @@
+"""
+This module tests the streaming JSON writers
+"""
+import io
+import json
+
+import click
+import pytest
+
+from click_tree_viz import ClickTreeViz
+from click_tree_viz.click_utils import recurse_click_cli
+from click_tree_viz.json_utils import iter_json_chunks
+from .examples.naval import naval
+from .examples.termui import termui
+
+
+@pytest.mark.parametrize("cli", [naval.cli, termui.cli, click.Group("empty")])
+@pytest.mark.parametrize("sort,reverse", [(True, False), (True, True), (False, False)])
+def test_write_json_matches_to_dict(cli, sort, reverse):
+    tree = ClickTreeViz(cli)
+    stream = io.StringIO()
+    tree.write_json(stream, sort=sort, reverse=reverse)
+
+    expected = json.dumps(tree.to_dict(sort=sort, reverse=reverse))
+    assert stream.getvalue() == expected
+    assert tree.to_json(sort=sort, reverse=reverse) == expected
+
+
+def test_iter_json_chunks_is_incremental():
+    chunks = iter_json_chunks(recurse_click_cli(naval.cli))
+    assert next(chunks) == '{"CLI": {"children": ['
+    assert next(chunks).startswith('{"mine": {"children": [')
+
+
+def test_write_ndjson_record_per_node():
+    stream = io.StringIO()
+    ClickTreeViz(naval.cli).write_json(stream, ndjson=True)
+    records = [json.loads(x) for x in stream.getvalue().splitlines()]
+
+    assert [x["path"] for x in records] == [
+        "ship",
+        "ship.new",
+        "ship.move",
+        "ship.shoot",
+        "mine",
+        "mine.set",
+        "mine.remove",
+    ]
+    assert records[0] == {
+        "path": "ship",
+        "parent": None,
+        "name": "ship",
+        "is_group": True,
+        "params": [],
+        "help": "Manages ships.",
+    }
+    assert records[1]["parent"] == "ship"
+    assert records[1]["params"] == [{"type": "argument", "name": "name", "opts": ["name"]}]
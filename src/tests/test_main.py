@@ -0,0 +1,64 @@
+"""
+This module tests the click-tree-viz console script
+"""
+import json
+
+from click.testing import CliRunner
+
+from click_tree_viz import ClickTreeViz
+from click_tree_viz.__main__ import main
+from .examples.naval import naval
+
+NAVAL_PATH = "tests.examples.naval.naval:cli"
+
+
+def test_prints_text_by_default():
+    result = CliRunner().invoke(main, [NAVAL_PATH])
+    assert result.exit_code == 0, result.output
+    assert result.output == ClickTreeViz(naval.cli).print(stdout=False)
+
+
+def test_writes_each_format(tmp_path):
+    out = tmp_path / "docs"
+    result = CliRunner().invoke(main, [NAVAL_PATH, "--format", "json,dot,rich,text", "--out", out])
+    assert result.exit_code == 0, result.output
+
+    tree = ClickTreeViz(naval.cli)
+    assert sorted(x.name for x in out.iterdir()) == [
+        "cli.dot",
+        "cli.json",
+        "cli.rich.txt",
+        "cli.txt",
+    ]
+    assert json.loads((out / "cli.json").read_text()) == tree.to_dict()
+    assert (out / "cli.dot").read_text() == tree.to_graphviz()
+    assert (out / "cli.txt").read_text() == tree.print(stdout=False)
+    assert "Manages ships." in (out / "cli.rich.txt").read_text(encoding="utf-8")
+
+
+def test_cache(tmp_path):
+    cache_dir = tmp_path / "cache"
+    for _ in range(2):
+        result = CliRunner().invoke(
+            main, [NAVAL_PATH, "--format", "ndjson", "--cache-dir", cache_dir]
+        )
+        assert result.exit_code == 0, result.output
+        assert len(result.output.splitlines()) == 7
+    assert len(list(cache_dir.iterdir())) == 1
+
+    # Each extra path is part of the fingerprint
+    plugin = tmp_path / "plugin.py"
+    plugin.write_text("")
+    args = [NAVAL_PATH, "--format", "ndjson", "--cache-dir", cache_dir, "--cache-path", plugin]
+    assert CliRunner().invoke(main, args).exit_code == 0
+    assert len(list(cache_dir.iterdir())) == 2
+
+
+def test_rejects_bad_arguments():
+    result = CliRunner().invoke(main, [NAVAL_PATH, "--format", "json,yaml"])
+    assert result.exit_code == 2
+    assert "yaml" in result.output
+
+    result = CliRunner().invoke(main, ["tests.examples.naval.naval:missing"])
+    assert result.exit_code == 1
+    assert "Could not import" in result.output
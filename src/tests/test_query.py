@@ -0,0 +1,57 @@
+"""
+This module tests the query indexes over the CLI structure
+"""
+import click
+
+from click_tree_viz import ClickTreeViz
+from .examples.naval import naval
+
+
+def _paths(nodes):
+    return [x.path for x in nodes]
+
+
+def test_index_lookups():
+    index = ClickTreeViz(naval.cli).index
+
+    assert len(index) == 7
+    assert "ship.move" in index and "ship.fly" not in index
+    assert index.get("ship.move").help == "Moves SHIP to the new location X,Y."
+    assert index.get("ship.fly") is None
+
+    assert _paths(index.with_option("--speed")) == ["ship.move"]
+    assert _paths(index.with_option("--moored")) == ["mine.set"]
+    assert index.with_option("--dry-run") == []
+    assert _paths(index.with_param_type("option")) == ["ship.move", "mine.set"]
+    assert len(index.with_param_type("argument")) == 5
+
+
+def test_index_route_trie():
+    index = ClickTreeViz(naval.cli).index
+
+    assert _paths(index.children()) == ["ship", "mine"]
+    assert _paths(index.children("ship")) == ["ship.new", "ship.move", "ship.shoot"]
+    assert index.children("ship.move") == []
+    assert index.children("fleet") == []
+    assert _paths(index.descendants("mine")) == ["mine.set", "mine.remove"]
+    assert len(list(index.descendants())) == 7
+
+
+def test_index_handles_dotted_names():
+    @click.group()
+    def cli():
+        """Root"""
+
+    @cli.group("v1.0")
+    def legacy():
+        """Legacy"""
+
+    @legacy.command()
+    @click.option("--dry-run", "-n", is_flag=True)
+    def deploy(dry_run):
+        """Deploy"""
+
+    tree = ClickTreeViz(cli)
+    assert tree.index is tree.index
+    assert _paths(tree.index.children("v1.0")) == ["v1.0.deploy"]
+    assert _paths(tree.index.with_option("-n")) == ["v1.0.deploy"]
@@ -0,0 +1,48 @@
+"""
+This module tests the immutable snapshot of a tree
+"""
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from click_tree_viz import ClickTreeViz, CliSnapshot
+from .examples.naval import naval
+from .examples.termui import termui
+
+
+def test_snapshot_is_frozen():
+    snapshot = ClickTreeViz(naval.cli).snapshot()
+
+    with pytest.raises(AttributeError):
+        snapshot._tree = None  # pylint:disable=protected-access
+    assert snapshot == ClickTreeViz(naval.cli).snapshot()
+    assert snapshot != ClickTreeViz(termui.cli).snapshot()
+    assert len({snapshot, ClickTreeViz(naval.cli).snapshot()}) == 1
+
+    restored = pickle.loads(pickle.dumps(snapshot))
+    assert restored == snapshot and hash(restored) == hash(snapshot)
+    assert restored.get("ship.move").params == snapshot.get("ship.move").params
+    assert snapshot.get("ship.sink") is None and snapshot.get("CLI") is None
+
+
+def test_snapshot_renders_concurrently():
+    tree = ClickTreeViz(termui.cli)
+    snapshot = pickle.loads(pickle.dumps(tree.snapshot()))
+    expected = [tree.to_json(), tree.to_graphviz(), tree.print(stdout=False)]
+
+    def _render(_):
+        return snapshot.render_many(["json", "dot", "text"])
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        outputs = list(executor.map(_render, range(8)))
+    assert all(x == expected for x in outputs)
+
+
+def test_from_snapshot():
+    snapshot = CliSnapshot(ClickTreeViz(naval.cli).snapshot().nodes)
+    tree = ClickTreeViz.from_snapshot(snapshot)
+    assert tree.print(stdout=False, root="mine") == ClickTreeViz(naval.cli).print(
+        stdout=False, root="mine"
+    )
+    assert tree.snapshot() == snapshot